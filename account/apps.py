@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountConfig(AppConfig):
     name = "account"
+
+    def ready(self):
+        # Register signal handlers (authentication user cache)
+        from . import signals  # noqa: F401
@@ -0,0 +1,95 @@
+"""
+JWT authentication with an in-process user cache
+
+SimpleJWT's JWTAuthentication loads the user with a SELECT on auth_user
+for every request. CachedJWTAuthentication keeps recently seen users in
+memory for USER_CACHE_TTL seconds, so most API calls skip that query.
+
+- Entries are dropped by the User save/delete signals (see signals.py),
+  so deactivating or changing a user takes effect at once in this process
+  and within USER_CACHE_TTL in the others. QuerySet.update() sends no
+  signal: call forget_user() after one.
+- is_active (and the password-change claim when CHECK_REVOKE_TOKEN is on)
+  is checked on every request, cached or not.
+- Each request gets its own copy of the user object.
+"""
+
+import copy
+import threading
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 10000
+
+_lock = threading.Lock()
+# str(user id) -> (expires, user)
+_users = {}
+
+
+def forget_user(user_id):
+    with _lock:
+        _users.pop(str(user_id), None)
+
+
+def clear_users():
+    """Forget every cached user (tests start from an empty cache with it)"""
+    with _lock:
+        _users.clear()
+
+
+def _cached_user(user_id):
+    entry = _users.get(user_id)
+    if entry is None:
+        return None
+    expires, user = entry
+    if expires <= time.monotonic():
+        forget_user(user_id)
+        return None
+    return user
+
+
+def _remember_user(user_id, user):
+    with _lock:
+        if len(_users) >= USER_CACHE_SIZE:
+            # Oldest insertion first
+            _users.pop(next(iter(_users)))
+        _users[user_id] = (time.monotonic() + USER_CACHE_TTL, user)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reads the user from the in-process cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        user_id = str(user_id)
+        user = _cached_user(user_id)
+        if user is None:
+            # Cache miss: one query, plus SimpleJWT's own checks
+            user = super().get_user(validated_token)
+            _remember_user(user_id, user)
+            return copy.copy(user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return copy.copy(user)
@@ -0,0 +1,203 @@
+"""
+In-process Bloom filter over the blacklisted refresh token ids (jti)
+
+Most refresh tokens checked are not blacklisted, and SimpleJWT answers
+that with a JOIN on token_blacklist_blacklistedtoken every time. The
+filter answers "definitely not blacklisted" from memory; only a possible
+hit (a blacklisted token, or a rare false positive) goes to the database.
+
+- Built on first use from the BlacklistedToken table, then kept current
+  with the rows added since the highest id loaded (one indexed query at
+  most every SYNC_INTERVAL seconds) and by add() for this process's own
+  blacklists.
+- Rebuilt every REBUILD_INTERVAL seconds (pruned tokens drop out) or when
+  it holds more than its capacity (to keep false positives rare). The new
+  filter is built outside the lock and swapped in, by one thread at a
+  time: requests keep using the old one meanwhile and only the very first
+  build makes them wait. Tokens add()ed during a rebuild are carried over.
+- Row ids are handed out when a row is inserted, not when it commits, so
+  a row can become visible after higher ids were already loaded. The ids
+  skipped below the watermark (the newest GAP_SPAN of them) are looked up
+  again on every sync for GAP_TIMEOUT seconds; a row committing later
+  than that is only seen at the next rebuild.
+- Another worker's blacklist may be unseen here for up to SYNC_INTERVAL.
+  Blacklisting itself never relies on the filter: the unique row in
+  BlacklistedToken decides (see tokens.RefreshToken.blacklist), so a
+  rotated or logged out token still cannot be used twice.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.db.models import Count, Max, Q
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+CAPACITY = 1_000_000
+ERROR_RATE = 0.001
+SYNC_INTERVAL = 5
+REBUILD_INTERVAL = 60 * 60
+GAP_SPAN = 10_000
+GAP_TIMEOUT = 5 * 60
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        # Optimal bit count and number of hashes for capacity items
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class TokenBlacklistFilter:
+    """The Bloom filter plus what is needed to keep it in step with the table"""
+
+    def __init__(self):
+        # _lock guards the filter's contents; _update_lock lets one thread
+        # at a time sync or rebuild it
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._filter = None
+        self._watermark = 0
+        # id -> time (monotonic) it is no longer looked up
+        self._gaps = {}
+        # jtis add()ed while a rebuild runs, None otherwise
+        self._added = None
+        self._synced = 0.0
+        self._built = 0.0
+
+    def _rows(self, after_id, ids=()):
+        # (id, jti) of the rows after after_id or in ids, in id order
+        condition = Q(id__gt=after_id)
+        if ids:
+            condition |= Q(id__in=list(ids))
+        return (
+            BlacklistedToken.objects.filter(condition)
+            .order_by("id")
+            .values_list("id", "token__jti")
+            .iterator(chunk_size=10000)
+        )
+
+    @staticmethod
+    def _add_gaps(gaps, ids, after_id, now):
+        # Ids missing between after_id and the last of ids (in order)
+        if not ids:
+            return
+        present = set(ids)
+        for row_id in range(max(after_id, ids[-1] - GAP_SPAN) + 1, ids[-1]):
+            if row_id not in present:
+                gaps[row_id] = now + GAP_TIMEOUT
+
+    def _rebuild(self, now):
+        with self._lock:
+            self._added = []
+        try:
+            table = BlacklistedToken.objects.aggregate(
+                count=Count("id"), last=Max("id")
+            )
+            bloom = BloomFilter(max(CAPACITY, table["count"] * 2))
+            recent_after = (table["last"] or 0) - GAP_SPAN
+            watermark, recent = 0, []
+            for row_id, jti in self._rows(0):
+                bloom.add(jti)
+                watermark = row_id
+                if row_id > recent_after:
+                    recent.append(row_id)
+            gaps = {}
+            self._add_gaps(gaps, recent, 0, now)
+
+            with self._lock:
+                for jti in self._added:
+                    bloom.add(jti)
+                self._filter = bloom
+                self._watermark = watermark
+                self._gaps = gaps
+                self._built = self._synced = now
+        finally:
+            with self._lock:
+                self._added = None
+
+    def _sync(self, now):
+        self._gaps = {
+            row_id: until for row_id, until in self._gaps.items() if until > now
+        }
+        rows = list(self._rows(self._watermark, self._gaps))
+        with self._lock:
+            for row_id, jti in rows:
+                self._filter.add(jti)
+        new_ids = []
+        for row_id, jti in rows:
+            if row_id > self._watermark:
+                new_ids.append(row_id)
+            else:
+                del self._gaps[row_id]
+        self._add_gaps(self._gaps, new_ids, self._watermark, now)
+        if new_ids:
+            self._watermark = new_ids[-1]
+        self._synced = now
+
+    def _refresh(self):
+        if self._filter is None:
+            # First use: callers wait for the filter
+            with self._update_lock:
+                if self._filter is None:
+                    self._rebuild(time.monotonic())
+            return
+        now = time.monotonic()
+        if now - self._synced < SYNC_INTERVAL:
+            return
+        # Someone else is already updating: use the filter as it is
+        if not self._update_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._built >= REBUILD_INTERVAL:
+                self._rebuild(now)
+            elif now - self._synced >= SYNC_INTERVAL:
+                self._sync(now)
+                if self._filter.count > self._filter.capacity:
+                    self._rebuild(now)
+        finally:
+            self._update_lock.release()
+
+    def might_contain(self, jti):
+        """False: jti is not blacklisted (as of the last sync)"""
+        self._refresh()
+        return jti in self._filter
+
+    def add(self, jti):
+        """Record a token this process has just blacklisted"""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+            if self._added is not None:
+                self._added.append(jti)
+
+    def reset(self):
+        with self._update_lock, self._lock:
+            self._filter = None
+            self._watermark = 0
+            self._gaps = {}
+
+
+token_blacklist = TokenBlacklistFilter()
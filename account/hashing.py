@@ -0,0 +1,165 @@
+"""
+Password hashing off the request thread
+
+PBKDF2 costs ~100 ms of CPU per login or registration. Done inline it
+blocks the worker (under ASGI: the event loop serving every request), so
+a login burst stalls the whole API. The async login/register views hand
+it to a small process pool instead:
+
+- PASSWORD_HASH_WORKERS processes (spawned, each runs django.setup())
+  do the hashing; the event loop only awaits the result.
+- At most PASSWORD_HASH_MAX_PENDING hashes may be running or queued per
+  worker process. Past that HashingBusy is raised and the views answer
+  503 with Retry-After, so a login storm is shed instead of piling up.
+- stats() reports the queue depth and counters; the depth is logged
+  when requests start waiting and when they are turned away.
+- If a worker process dies (crash, OOM kill) the pool is broken for
+  good: it is thrown away, the request gets the same 503 and the next
+  one starts a new pool.
+"""
+
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER = 1
+
+
+class HashingBusy(Exception):
+    """Too many password hashes pending: retry later"""
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+def _make_password(password):
+    from django.contrib.auth.hashers import make_password
+
+    return make_password(password)
+
+
+def _check_password(password, encoded):
+    """
+    (matches, new hash or None)
+    A new hash is returned when the stored one uses outdated settings,
+    like User.check_password() would save
+    """
+    from django.contrib.auth.hashers import check_password, identify_hasher
+
+    if not check_password(password, encoded):
+        return False, None
+    try:
+        outdated = identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        outdated = False
+    return True, _make_password(password) if outdated else None
+
+
+_lock = threading.Lock()
+_executor = None
+_stats = {
+    "pending": 0,
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "max_pending_seen": 0,
+}
+
+
+def _workers():
+    return getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+
+
+def _max_pending():
+    return getattr(settings, "PASSWORD_HASH_MAX_PENDING", 16)
+
+
+def new_pool(workers):
+    """Process pool with Django set up in each worker (settings, hashers)"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        # spawn: forking a process that has DB connections and
+        # threads open is unsafe
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"),),
+    )
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = new_pool(_workers())
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+        return _executor
+
+
+def _discard(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stats():
+    """Counters for this worker process; queued = waiting for a free process"""
+    with _lock:
+        current = dict(_stats)
+    current["queued"] = max(0, current["pending"] - _workers())
+    return current
+
+
+async def _run(func, *args):
+    with _lock:
+        pending = _stats["pending"]
+        if pending >= _max_pending():
+            _stats["rejected"] += 1
+            logger.warning(
+                "Password hashing busy: %d pending, request rejected", pending
+            )
+            raise HashingBusy()
+        _stats["pending"] = pending + 1
+        _stats["max_pending_seen"] = max(_stats["max_pending_seen"], pending + 1)
+    if pending >= _workers():
+        logger.info("Password hashing queue depth %d", pending + 1 - _workers())
+
+    failed = True
+    try:
+        executor = _get_executor()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(executor, func, *args)
+        failed = False
+        return result
+    except BrokenProcessPool:
+        logger.error("Password hashing pool broken (worker died), starting a new one")
+        _discard(executor)
+        raise HashingBusy()
+    finally:
+        with _lock:
+            _stats["pending"] -= 1
+            _stats["failed" if failed else "completed"] += 1
+
+
+async def make_password(password):
+    """Django-format hash of password"""
+    return await _run(_make_password, password)
+
+
+async def check_password(password, encoded):
+    """(matches, new hash to save or None)"""
+    return await _run(_check_password, password, encoded)
@@ -0,0 +1,235 @@
+"""
+Import users from a CSV or JSONL file
+
+    python manage.py import_users users.csv
+    python manage.py import_users users.jsonl --rejects rejects.jsonl
+    python manage.py import_users - --format jsonl < users.jsonl
+
+One user per row/line with the RegisterSerializer fields: username,
+email, role, and either password (plain text, hashed here) or
+password_hash (a Django-format hash, stored as is, e.g. already converted
+from the old system).
+
+The file is read a batch at a time. Each batch is validated with the
+RegisterSerializer rules (username uniqueness: one query per batch, plus
+the usernames seen earlier in the file), its passwords are hashed by a
+pool of --workers processes (see account/hashing.py) and the valid users
+are written with a single bulk_create. Rejected rows are reported with
+their line number and errors, to --rejects as JSONL if given.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from account.hashing import new_pool
+from account.serializers import RegisterSerializer
+
+
+class ImportSerializer(RegisterSerializer):
+    password = serializers.CharField(write_only=True, required=False)
+    password_hash = serializers.CharField(write_only=True, required=False)
+
+    class Meta(RegisterSerializer.Meta):
+        fields = RegisterSerializer.Meta.fields + ["password_hash"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Checked for the whole batch at once instead (one query)
+        fields["username"].validators = [
+            validator
+            for validator in fields["username"].validators
+            if not isinstance(validator, UniqueValidator)
+        ]
+        return fields
+
+    def validate_password_hash(self, value):
+        try:
+            identify_hasher(value)
+        except ValueError:
+            raise serializers.ValidationError("Not a Django password hash.")
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get("password") and not attrs.get("password_hash"):
+            raise serializers.ValidationError({"password": ["This field is required."]})
+        return attrs
+
+
+def read_csv(stream):
+    # Line 1 is the header
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        yield line, row
+
+
+def read_jsonl(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line, {"__error__": f"Invalid JSON: {e}"}
+            continue
+        yield line, row if isinstance(row, dict) else {"__error__": "Not an object"}
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def new_user(data, password_hash):
+    # What RegisterSerializer.create() saves, without the INSERT
+    role = data.pop("role", None)
+    data.pop("password", None)
+    data.pop("password_hash", None)
+    user = User(**data, password=password_hash)
+    if role == "admin":
+        user.is_staff = True
+        user.is_superuser = True
+    return user
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV or JSONL file in hashed, batched inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, - for stdin")
+        parser.add_argument(
+            "--format", choices=READERS, help="Default: from the file extension"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes hashing passwords",
+        )
+        parser.add_argument("--rejects", help="Write rejected rows here (JSONL)")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate and hash, write nothing"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if format not in READERS:
+            raise CommandError("Pass --format csv or --format jsonl")
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        self.rejects = (
+            open(options["rejects"], "w", encoding="utf-8")
+            if options["rejects"]
+            else None
+        )
+        self.seen = set()
+        self.imported = self.rejected = 0
+        started = time.monotonic()
+        try:
+            with new_pool(options["workers"]) as pool:
+                rows = READERS[format](stream)
+                while batch := list(islice(rows, options["batch_size"])):
+                    self.import_batch(batch, pool, options["dry_run"])
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{self.imported} imported, {self.rejected} rejected"
+                        f" ({self.imported / elapsed:.0f} users/s)"
+                    )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.rejects:
+                self.rejects.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done in {elapsed:.1f}s: {self.imported} users imported"
+                f"{' (dry run)' if options['dry_run'] else ''},"
+                f" {self.rejected} rejected"
+            )
+        )
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if self.rejects:
+            self.rejects.write(json.dumps({"line": line, "errors": errors}) + "\n")
+        else:
+            self.stderr.write(f"Line {line}: {json.dumps(errors)}")
+
+    def validate(self, batch):
+        """(line, validated data) of the valid rows; rejects the others"""
+        valid = []
+        for line, row in batch:
+            if "__error__" in row:
+                self.reject(line, {"non_field_errors": [row["__error__"]]})
+                continue
+            # Empty CSV cells count as missing
+            row = {key: value for key, value in row.items() if value not in ("", None)}
+            serializer = ImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((line, dict(serializer.validated_data)))
+            else:
+                self.reject(line, serializer.errors)
+
+        taken = set(
+            User.objects.filter(
+                username__in=[data["username"] for line, data in valid]
+            ).values_list("username", flat=True)
+        )
+        unique = []
+        for line, data in valid:
+            if data["username"] in taken or data["username"] in self.seen:
+                self.reject(
+                    line, {"username": ["A user with that username already exists."]}
+                )
+                continue
+            self.seen.add(data["username"])
+            unique.append((line, data))
+        return unique
+
+    def import_batch(self, batch, pool, dry_run):
+        valid = self.validate(batch)
+        to_hash = [
+            data["password"] for line, data in valid if "password_hash" not in data
+        ]
+        hashes = iter(
+            pool.map(make_password, to_hash, chunksize=max(1, len(to_hash) // 64))
+        )
+        users = [
+            (line, new_user(data, data.get("password_hash") or next(hashes)))
+            for line, data in valid
+        ]
+        if dry_run or not users:
+            self.imported += len(users)
+            return
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for line, user in users])
+        except IntegrityError:
+            # Someone registered one of these usernames meanwhile: drop
+            # those and write the rest
+            taken = set(
+                User.objects.filter(
+                    username__in=[user.username for line, user in users]
+                ).values_list("username", flat=True)
+            )
+            for line, user in users:
+                if user.username in taken:
+                    self.reject(
+                        line,
+                        {"username": ["A user with that username already exists."]},
+                    )
+            users = [(line, user) for line, user in users if user.username not in taken]
+            User.objects.bulk_create([user for line, user in users])
+        self.imported += len(users)
@@ -0,0 +1,90 @@
+"""
+Delete expired refresh token bookkeeping in small batches
+
+    python manage.py prune_tokens                  # one pass (e.g. hourly cron)
+    python manage.py prune_tokens --interval 3600  # keep running
+
+Every refresh (ROTATE_REFRESH_TOKENS + BLACKLIST_AFTER_ROTATION) adds an
+OutstandingToken, a BlacklistedToken and a RotatedToken row (the claim,
+see account/rotation.py). Once a token has expired it can never be
+accepted again, so all of them can go.
+
+SimpleJWT's flushexpiredtokens deletes them all in one statement, which
+locks a large table for a long time. This walks the table in primary key
+ranges (expires_at has no index) and deletes each batch's expired rows in
+its own short transaction, optionally pausing between batches.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from account.models import RotatedToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted tokens in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause", type=float, default=0, help="Seconds to sleep between batches"
+        )
+        parser.add_argument(
+            "--interval", type=float, help="Run again every INTERVAL seconds"
+        )
+
+    def handle(self, *args, **options):
+        batch_size, pause = options["batch_size"], options["pause"]
+        while True:
+            # Blacklist entries go with their token (same transaction)
+            self.prune(
+                "refresh tokens",
+                OutstandingToken.objects.all(),
+                batch_size,
+                pause,
+                related=[(BlacklistedToken, "token_id")],
+            )
+            self.prune("rotation claims", RotatedToken.objects.all(), batch_size, pause)
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def prune(self, label, queryset, batch_size, pause, related=()):
+        """
+        Delete the expired rows of queryset batch_size at a time
+        related: (model, foreign key column) pairs whose rows pointing at a
+        deleted row are deleted with it
+        Returns how many rows were deleted.
+        """
+        now = timezone.now()
+        deleted = 0
+        last_id = 0
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "expires_at")[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            expired = [row_id for row_id, expires_at in rows if expires_at <= now]
+            if expired:
+                with transaction.atomic():
+                    for model, column in related:
+                        model.objects.filter(**{f"{column}__in": expired}).delete()
+                    queryset.filter(id__in=expired).delete()
+                deleted += len(expired)
+                if pause:
+                    time.sleep(pause)
+
+        self.stdout.write(f"Deleted {deleted} expired {label}")
+        return deleted
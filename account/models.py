@@ -1,3 +1,25 @@
+"""
+Account Models
+Users are Django's own auth User; the token tables are SimpleJWT's
+(token_blacklist app). This only adds the rotation claim.
+"""
+
 from django.db import models
 
-# Create your models here.
+
+class RotatedToken(models.Model):
+    """
+    One row per refresh token spent on a rotation (token/refresh/)
+
+    The unique jti is the claim: a second INSERT for the same token fails
+    in whichever worker process tries it, so a replayed refresh token is
+    refused at once, before its BlacklistedToken row is written in the
+    next batch (see rotation.py). Rows are deleted by prune_tokens once
+    the token has expired.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.jti
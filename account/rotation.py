@@ -0,0 +1,205 @@
+"""
+Write-behind bookkeeping for refresh token rotation
+
+Rotating a refresh token (token/refresh/) blacklists the old token and
+records the new one as outstanding: with SimpleJWT that is two user
+queries, two get_or_create() and up to three INSERTs inside the request.
+Here the request makes one INSERT, the claim, and the SimpleJWT rows are
+written by a background thread in batches (bulk_create, a handful of
+queries per batch whatever its size) every FLUSH_INTERVAL seconds, or
+sooner once FLUSH_SIZE rotations are waiting.
+
+The claim is what refuses a replay, at once and in every worker process:
+a RotatedToken row with the old token's jti, unique in the database, so
+only the first rotation of a token can insert it. The recently rotated
+set spares this process the failing INSERT for tokens it already knows
+are spent; its entries stay until the rows are written and RECENT_TTL
+more (by then every process's Bloom filter has the rows, see
+blacklist.py).
+
+Rows still waiting are written at exit (atexit) too; flush() writes them
+straight away. A failed write is retried on the next flush, nothing is
+dropped: rows are only queued after their claim was written, so they
+can't pile up while the database is down.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from core.background import BackgroundWorker
+
+from .blacklist import token_blacklist
+from .models import RotatedToken
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1
+FLUSH_SIZE = 500
+RECENT_TTL = 5 * 60
+
+
+def _row(token):
+    # What OutstandingToken needs, without the user lookup
+    return {
+        "jti": token.payload[api_settings.JTI_CLAIM],
+        "user_id": token.payload.get(api_settings.USER_ID_CLAIM),
+        "token": str(token),
+        "created_at": token.current_time,
+        "expires_at": datetime_from_epoch(token.payload["exp"]),
+    }
+
+
+class RotationBuffer(BackgroundWorker):
+    thread_name = "token-rotation-flush"
+    interval = FLUSH_INTERVAL
+    failure_message = "Token rotation flush failed"
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._outstanding = []
+        self._blacklisted = []
+        # jti -> time (monotonic) it can be forgotten; inf until written
+        self._recent = {}
+        # (time, jtis) in time order, to find the entries to forget
+        self._forget = deque()
+
+    def was_rotated(self, jti):
+        """True: jti has been rotated or blacklisted here, maybe not yet written"""
+        return self._recent.get(jti, 0) > time.monotonic()
+
+    def claim(self, token):
+        """
+        Mark token as spent and queue its blacklist row
+        False if it had been spent already, by this process or another one
+        """
+        self.start()
+        row = _row(token)
+        jti = row["jti"]
+        if self.was_rotated(jti):
+            return False
+        try:
+            with transaction.atomic():
+                RotatedToken.objects.create(jti=jti, expires_at=row["expires_at"])
+        except IntegrityError:
+            self._remember([jti])
+            return False
+
+        with self._lock:
+            self._recent[jti] = float("inf")
+            self._blacklisted.append(row)
+            waiting = len(self._blacklisted)
+        token_blacklist.add(jti)
+        if waiting >= FLUSH_SIZE:
+            self.wake()
+        return True
+
+    def outstand(self, token):
+        """Queue the outstanding token row of a newly issued token"""
+        self.start()
+        with self._lock:
+            self._outstanding.append(_row(token))
+            waiting = len(self._outstanding)
+        if waiting >= FLUSH_SIZE:
+            self.wake()
+
+    def _write(self, outstanding, blacklisted):
+        User = get_user_model()
+        field = User._meta.get_field(api_settings.USER_ID_FIELD)
+        # Claims hold the user id as a string
+        user_ids = {
+            row["user_id"]: field.to_python(row["user_id"])
+            for row in outstanding + blacklisted
+            if row["user_id"] is not None
+        }
+        # Tokens of users deleted meanwhile are kept without a user, as
+        # SimpleJWT does
+        users = dict(
+            User.objects.filter(
+                **{f"{field.name}__in": set(user_ids.values())}
+            ).values_list(field.name, "pk")
+        )
+        rows = {row["jti"]: row for row in blacklisted + outstanding}
+        with transaction.atomic():
+            OutstandingToken.objects.bulk_create(
+                [
+                    OutstandingToken(
+                        jti=row["jti"],
+                        user_id=users.get(user_ids.get(row["user_id"])),
+                        token=row["token"],
+                        created_at=row["created_at"],
+                        expires_at=row["expires_at"],
+                    )
+                    for row in rows.values()
+                ],
+                ignore_conflicts=True,
+            )
+            if blacklisted:
+                ids = OutstandingToken.objects.filter(
+                    jti__in=[row["jti"] for row in blacklisted]
+                ).values_list("id", flat=True)
+                BlacklistedToken.objects.bulk_create(
+                    [BlacklistedToken(token_id=token_id) for token_id in ids],
+                    ignore_conflicts=True,
+                )
+
+    def _remember(self, jtis):
+        # Keep refusing them for RECENT_TTL more, then leave it to the
+        # Bloom filter and the database
+        forget_at = time.monotonic() + RECENT_TTL
+        with self._lock:
+            for jti in jtis:
+                self._recent[jti] = forget_at
+            self._forget.append((forget_at, jtis))
+
+    def _forget_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._forget and self._forget[0][0] <= now:
+                for jti in self._forget.popleft()[1]:
+                    if self._recent.get(jti, 0) <= now:
+                        self._recent.pop(jti, None)
+
+    def flush(self):
+        """Write every queued row now; returns how many were written"""
+        self._forget_expired()
+        with self._lock:
+            outstanding, self._outstanding = self._outstanding, []
+            blacklisted, self._blacklisted = self._blacklisted, []
+        if not outstanding and not blacklisted:
+            return 0
+
+        try:
+            self._write(outstanding, blacklisted)
+        except DatabaseError:
+            # Put them back for the next flush; the claims are written
+            # already, so the rotated tokens stay refused meanwhile
+            logger.exception(
+                "Could not write %d rotated tokens, will retry",
+                len(outstanding) + len(blacklisted),
+            )
+            with self._lock:
+                self._outstanding[:0] = outstanding
+                self._blacklisted[:0] = blacklisted
+            return 0
+
+        self._remember([row["jti"] for row in blacklisted])
+        return len(outstanding) + len(blacklisted)
+
+    def pending(self):
+        with self._lock:
+            return len(self._outstanding) + len(self._blacklisted)
+
+
+rotations = RotationBuffer()
@@ -1,5 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from .tokens import RotatingRefreshToken
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -13,9 +17,14 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         role = validated_data.pop("role", None)
         password = validated_data.pop("password")
+        # Already hashed by the caller (see account/hashing.py): save(password_hash=...)
+        password_hash = validated_data.pop("password_hash", None)
 
         user = User(**validated_data)
-        user.set_password(password)
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
 
         if role == "admin":
             user.is_staff = True
@@ -24,3 +33,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    # Blacklist check through the in-memory Bloom filter (see blacklist.py),
+    # rotation rows written in batches after the response (see rotation.py)
+    # Used by token/refresh/ via SIMPLE_JWT["TOKEN_REFRESH_SERIALIZER"]
+    token_class = RotatingRefreshToken
@@ -0,0 +1,18 @@
+"""
+Signal handlers for the user model
+Connected in AccountConfig.ready()
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import forget_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    # Deactivated, changed or deleted: the next request reloads the user
+    forget_user(getattr(instance, api_settings.USER_ID_FIELD))
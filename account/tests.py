@@ -1,3 +1,381 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from core import throttling
+
+from . import authentication, blacklist, hashing
+from .models import RotatedToken
+from .rotation import RotationBuffer
+from .tokens import RefreshToken
+
+
+class RotationTests(TestCase):
+    """
+    token/refresh/ with write-behind bookkeeping (rotation.py)
+    A second RotationBuffer stands in for another worker process: its own
+    recently rotated set, nothing flushed yet
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        throttling.get_backend().reset()
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.buffer = self.worker()
+
+    def worker(self):
+        buffer = RotationBuffer()
+        # No flush thread: the tests flush when they want the rows
+        patcher = mock.patch.object(buffer, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def refresh(self, token, buffer):
+        with mock.patch("account.tokens.rotations", buffer):
+            return self.client.post(
+                reverse("token_refresh"), {"refresh": token}, format="json"
+            )
+
+    def test_rotation_returns_new_pair(self):
+        token = str(RefreshToken.for_user(self.user))
+        response = self.refresh(token, self.buffer)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+        self.assertNotEqual(response.data["refresh"], token)
+        self.assertTrue(RotatedToken.objects.exists())
+
+    def test_replay_on_same_worker_is_rejected(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token, self.buffer).status_code, 200)
+        response = self.refresh(token, self.buffer)
+        self.assertEqual(response.status_code, 401)
+
+    def test_replay_on_another_worker_is_rejected_before_flush(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token, self.buffer).status_code, 200)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+        response = self.refresh(token, self.worker())
+        self.assertEqual(response.status_code, 401)
+
+    def test_replay_after_flush_is_rejected(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token, self.buffer).status_code, 200)
+        self.buffer.flush()
+        response = self.refresh(token, self.worker())
+        self.assertEqual(response.status_code, 401)
+
+    def test_flush_writes_bookkeeping(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(str(token), self.buffer)
+        new_token = RefreshToken(response.data["refresh"], verify=False)
+        self.assertEqual(self.buffer.pending(), 2)
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertTrue(
+            BlacklistedToken.objects.filter(token__jti=token["jti"]).exists()
+        )
+        outstanding = OutstandingToken.objects.get(jti=new_token["jti"])
+        self.assertEqual(outstanding.user, self.user)
+
+    def test_failed_flush_keeps_rows(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.refresh(token, self.buffer)
+        with mock.patch.object(
+            OutstandingToken.objects, "bulk_create", side_effect=DatabaseError
+        ), self.assertLogs("account.rotation", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending(), 2)
+        self.assertEqual(self.buffer.flush(), 2)
+
+
+class BlacklistFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.filter = blacklist.TokenBlacklistFilter()
+        patcher = mock.patch.object(blacklist, "SYNC_INTERVAL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def blacklist(self, jti, row_id):
+        token = OutstandingToken.objects.create(
+            user=self.user, jti=jti, token=jti, expires_at=timezone.now()
+        )
+        BlacklistedToken.objects.create(id=row_id, token=token)
+
+    def test_rows_committed_out_of_order(self):
+        self.blacklist("first", 1)
+        self.assertTrue(self.filter.might_contain("first"))
+        # 3 is visible before 2 commits
+        self.blacklist("third", 3)
+        self.assertTrue(self.filter.might_contain("third"))
+        self.assertEqual(list(self.filter._gaps), [2])
+
+        self.blacklist("second", 2)
+        self.assertTrue(self.filter.might_contain("second"))
+        self.assertEqual(self.filter._gaps, {})
+
+    def test_gaps_expire(self):
+        self.blacklist("first", 1)
+        self.blacklist("third", 3)
+        with mock.patch.object(blacklist, "GAP_TIMEOUT", 0):
+            self.filter.might_contain("first")
+            self.assertEqual(list(self.filter._gaps), [2])
+            self.filter.might_contain("first")
+        self.assertEqual(self.filter._gaps, {})
+
+    def test_adds_during_rebuild_are_kept(self):
+        self.blacklist("first", 1)
+        rows = self.filter._rows
+
+        def rows_while_adding(*args):
+            # Another thread blacklists a token halfway through the build
+            self.filter.add("added")
+            return rows(*args)
+
+        with mock.patch.object(self.filter, "_rows", rows_while_adding):
+            self.assertTrue(self.filter.might_contain("first"))
+        self.assertTrue(self.filter.might_contain("added"))
+        self.assertIsNone(self.filter._added)
+
+    def test_readers_do_not_wait_for_a_rebuild(self):
+        self.blacklist("first", 1)
+        self.assertTrue(self.filter.might_contain("first"))
+        # Held by a rebuild in another thread
+        with self.filter._update_lock, mock.patch.object(
+            blacklist, "REBUILD_INTERVAL", 0
+        ):
+            self.assertTrue(self.filter.might_contain("first"))
+            self.assertFalse(self.filter.might_contain("other"))
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication.clear_users()
+        self.addCleanup(authentication.clear_users)
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+
+    def authenticate(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        user, _ = authentication.CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def test_cache_hit_runs_no_query(self):
+        with self.assertNumQueries(1):
+            first = self.authenticate()
+        with self.assertNumQueries(0):
+            second = self.authenticate()
+        self.assertEqual(second, self.user)
+        # A copy per request
+        self.assertIsNot(second, first)
+
+    def test_saved_user_is_reloaded(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, "inactive"):
+            self.authenticate()
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(client.get(reverse("todo_name")).status_code, 401)
+
+    def test_deleted_user_is_forgotten(self):
+        self.authenticate()
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, "User not found"):
+            self.authenticate()
+
+    def test_other_processes_see_changes_within_the_ttl(self):
+        self.authenticate()
+        # A change this process gets no signal for (another process, or
+        # QuerySet.update())
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.authenticate(), self.user)
+
+        later = authentication.time.monotonic() + authentication.USER_CACHE_TTL
+        with mock.patch.object(authentication.time, "monotonic", return_value=later):
+            with self.assertRaisesMessage(AuthenticationFailed, "inactive"):
+                self.authenticate()
+
+
+class PruneTokensTests(TestCase):
+    def test_only_expired_rows_are_deleted(self):
+        user = User.objects.create_user("asha", password="pw-12345")
+        now = timezone.now()
+        for index in range(5):
+            expires_at = now + timedelta(days=1 if index % 2 else -1)
+            token = OutstandingToken.objects.create(
+                user=user, jti=f"jti-{index}", token="", expires_at=expires_at
+            )
+            BlacklistedToken.objects.create(token=token)
+            RotatedToken.objects.create(jti=f"jti-{index}", expires_at=expires_at)
+
+        out = io.StringIO()
+        call_command("prune_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 3 expired refresh tokens", out.getvalue())
+        self.assertIn("Deleted 3 expired rotation claims", out.getvalue())
+        live = ["jti-1", "jti-3"]
+        self.assertEqual(
+            sorted(OutstandingToken.objects.values_list("jti", flat=True)), live
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+        self.assertEqual(
+            sorted(RotatedToken.objects.values_list("jti", flat=True)), live
+        )
+
+
+class BrokenPool:
+    """Stands in for a process pool whose worker was killed"""
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+    def shutdown(self, **kwargs):
+        self.shut_down = True
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        throttling.get_backend().reset()
+        self.user = User.objects.create_user("asha", password="pw-12345")
+
+    def login(self, data):
+        return self.client.post(
+            reverse("user_login"), data, content_type="application/json"
+        )
+
+    def test_login(self):
+        response = self.login({"username": "asha", "password": "pw-12345"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("refresh", response.json())
+
+        response = self.login({"username": "asha", "password": "wrong"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_non_string_credentials(self):
+        for data in (
+            {"username": "asha", "password": 12345},
+            {"username": ["asha"], "password": "pw-12345"},
+            {"username": "asha", "password": {"a": 1}},
+        ):
+            with self.subTest(data):
+                self.assertEqual(self.login(data).status_code, 400)
+
+    def test_broken_pool_is_replaced(self):
+        pool = BrokenPool()
+        with mock.patch.object(hashing, "_executor", pool), self.assertLogs(
+            "account.hashing", "ERROR"
+        ):
+            before = hashing.stats()
+            response = self.login({"username": "asha", "password": "pw-12345"})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], str(hashing.RETRY_AFTER))
+            # Thrown away: the next request starts a new pool
+            self.assertIsNone(hashing._executor)
+            self.assertTrue(pool.shut_down)
+
+        after = hashing.stats()
+        self.assertEqual(after["failed"], before["failed"] + 1)
+        self.assertEqual(after["completed"], before["completed"])
+        self.assertEqual(after["pending"], 0)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        User.objects.create_user("taken", password="pw-12345")
+        # Threads instead of spawned processes: same hashing, faster start
+        patcher = mock.patch(
+            "account.management.commands.import_users.new_pool", ThreadPoolExecutor
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        rejects = os.path.join(self.directory, "rejects.jsonl")
+        call_command(
+            "import_users",
+            path,
+            "--rejects",
+            rejects,
+            "--batch-size",
+            "2",
+            "--workers",
+            "2",
+            *args,
+            stdout=io.StringIO(),
+        )
+        with open(rejects, encoding="utf-8") as file:
+            return {row["line"]: row["errors"] for row in map(json.loads, file)}
+
+    def test_csv(self):
+        path = self.write(
+            "users.csv",
+            "username,email,password,role\n"
+            "asha,asha@example.com,pw-12345,\n"
+            "bikash,,pw-67890,admin\n"
+            "taken,,pw-12345,\n"
+            "asha,,pw-12345,\n"
+            "nopassword,,,\n",
+        )
+        rejects = self.run_import(path)
+        self.assertEqual(sorted(rejects), [4, 5, 6])
+        self.assertIn("username", rejects[4])
+        self.assertIn("username", rejects[5])
+        self.assertIn("password", rejects[6])
+
+        asha = User.objects.get(username="asha")
+        self.assertTrue(asha.check_password("pw-12345"))
+        self.assertEqual(asha.email, "asha@example.com")
+        self.assertTrue(User.objects.get(username="bikash").is_superuser)
+
+    def test_jsonl_with_hashes(self):
+        password_hash = make_password("pw-12345")
+        path = self.write(
+            "users.jsonl",
+            json.dumps({"username": "asha", "password_hash": password_hash})
+            + "\n\nnot json\n"
+            + json.dumps({"username": "bikash", "password_hash": "plain"})
+            + "\n",
+        )
+        rejects = self.run_import(path)
+        self.assertEqual(sorted(rejects), [3, 4])
+        self.assertIn("password_hash", rejects[4])
+        self.assertEqual(User.objects.get(username="asha").password, password_hash)
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write("users.csv", "username,password\nasha,pw-12345\n")
+        self.assertEqual(self.run_import(path, "--dry-run"), {})
+        self.assertFalse(User.objects.filter(username="asha").exists())
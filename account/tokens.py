@@ -0,0 +1,51 @@
+"""
+Refresh token with the blacklist check fronted by the Bloom filter
+(see blacklist.py), and the write-behind variant used for rotation
+(see rotation.py)
+"""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .blacklist import token_blacklist
+from .rotation import rotations
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        # Rotated moments ago: its row may not be written yet
+        if rotations.was_rotated(jti):
+            raise TokenError(_("Token is blacklisted"))
+        # Not in the filter: not blacklisted, no query needed
+        if not token_blacklist.might_contain(jti):
+            return
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        if not created:
+            # Someone blacklisted it first (token reused, e.g. two refreshes
+            # racing): the database row decides, whatever the filter said
+            raise TokenError(_("Token is blacklisted"))
+        token_blacklist.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted, created
+
+
+class RotatingRefreshToken(RefreshToken):
+    """
+    RefreshToken for token/refresh/: blacklisting the old token and
+    recording the new one are queued and written in batches
+    """
+
+    def blacklist(self):
+        if not rotations.claim(self):
+            # Rotated already: a replayed token
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstand(self):
+        rotations.outstand(self)
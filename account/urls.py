@@ -6,8 +6,8 @@ Defines all authentication-related endpoints
 from django.urls import path
 from .views import RegistrationView, LoginView, LogoutView
 
-# Import SimpleJWT's built-in views for token management
-from rest_framework_simplejwt.views import (
+# SimpleJWT's built-in views for token management (rate limited)
+from .views import (
     TokenObtainPairView,  # Get access and refresh tokens
     TokenRefreshView,  # Get new access token using refresh token
     TokenVerifyView,  # Verify if a token is valid
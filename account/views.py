@@ -3,73 +3,163 @@ Account Views - Handles user registration, login, and logout
 This module uses JWT (JSON Web Tokens) for authentication
 """
 
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt import views as jwt_views
+from core.throttling import rate_limit
+from . import hashing
 from .serializers import RegisterSerializer
-from django.contrib.auth import authenticate
 
-# Import JWT token classes from SimpleJWT
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+# SimpleJWT's RefreshToken, with the blacklist check behind a Bloom filter
+from .tokens import RefreshToken
+from .authentication import CachedJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.permissions import AllowAny
 
 
-class RegistrationView(APIView):
-
-    permission_classes = [AllowAny]
-
-    def post(self, request):
+def read_data(request):
+    """
+    Request body as a dict: JSON, or form fields
+    (these views are plain Django views, not DRF, so no request.data)
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST.dict()
+
+
+def hashing_busy_response():
+    # Too many logins/registrations waiting for a hash: shed the request
+    response = JsonResponse(
+        {"error": "Server busy, please retry"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = str(hashing.RETRY_AFTER)
+    return response
+
+
+def bad_json_response():
+    return JsonResponse(
+        {"error": "Request body must be a JSON object"},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+# Async views: the ~100 ms password hash runs in a process pool
+# (account/hashing.py) while the event loop keeps serving other requests
+# under ASGI (config/asgi.py). Responses are the same as before.
+# Rate limited per IP (core/throttling.py), before any hashing is done
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(rate_limit("register"), name="post")
+class RegistrationView(View):
+
+    async def post(self, request):
+        data = read_data(request)
+        if data is None:
+            return bad_json_response()
 
         # Validate the incoming data using our serializer
-        serializer = RegisterSerializer(data=request.data)
-
-        if serializer.is_valid():
-            # Save the user (serializer handles password hashing)
-            serializer.save()
-            return Response(
-                {
-                    "message": "User registered successfully",
-                    "user_id": serializer.data.get("id"),
-                    "username": serializer.data.get("username"),
-                },
-                status=status.HTTP_201_CREATED,
-            )
-        else:
+        # (username uniqueness is a query: run it off the event loop)
+        serializer = RegisterSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
             # Return validation errors if data is invalid
-            return Response(
+            return JsonResponse(
                 {"error": "Registration failed", "details": serializer.errors},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Hash the password in the pool, then save the user with it
+        try:
+            password_hash = await hashing.make_password(
+                serializer.validated_data["password"]
+            )
+        except hashing.HashingBusy:
+            return hashing_busy_response()
 
-class LoginView(APIView):
-    permission_classes = [AllowAny]
+        user_data = await sync_to_async(save_user)(serializer, password_hash)
+        return JsonResponse(
+            {
+                "message": "User registered successfully",
+                "user_id": user_data.get("id"),
+                "username": user_data.get("username"),
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
-    def post(self, request):
 
-        # Get username and password from request
-        username = request.data.get("username")
-        password = request.data.get("password")
+def save_user(serializer, password_hash):
+    serializer.save(password_hash=password_hash)
+    return serializer.data
+
 
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(rate_limit("login"), name="post")
+class LoginView(View):
+
+    async def post(self, request):
+        data = read_data(request)
+        if data is None:
+            return bad_json_response()
+
+        # Get username and password from request
+        username = data.get("username")
+        password = data.get("password")
 
         # Validate that both fields are provided
         if not username or not password:
-            return Response(
+            return JsonResponse(
                 {"error": "Username and password are required"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if not isinstance(username, str) or not isinstance(password, str):
+            return JsonResponse(
+                {"error": "Username and password must be strings"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Same checks as authenticate() with ModelBackend, but the
+        # password hash runs in the process pool
+        try:
+            user = await User._default_manager.aget_by_natural_key(username)
+        except User.DoesNotExist:
+            user = None
+
+        try:
+            if user is None:
+                # Hash anyway so unknown usernames take as long as wrong
+                # passwords (no username probing by timing)
+                await hashing.make_password(password)
+                matches = False
+            else:
+                matches, new_hash = await hashing.check_password(
+                    password, user.password
+                )
+        except hashing.HashingBusy:
+            return hashing_busy_response()
 
-        # Authenticate the user (Django checks username/password)
-        user = authenticate(username=username, password=password)
+        if matches and user.is_active:
+            if new_hash:
+                # Stored hash used older settings: keep the upgraded one
+                user.password = new_hash
+                await user.asave(update_fields=["password"])
 
-        if user:
             # If authentication successful, generate JWT tokens
             # RefreshToken is used to generate both access and refresh tokens
-            refresh = RefreshToken.for_user(user)
+            # (for_user records the outstanding token: a query)
+            refresh = await sync_to_async(RefreshToken.for_user)(user)
 
-            return Response(
+            return JsonResponse(
                 {
                     "message": "Login successful",
                     # Access token: Short-lived (15 min), use for API requests
@@ -85,7 +175,7 @@ class LoginView(APIView):
             )
         else:
             # Authentication failed - wrong username or password
-            return Response(
+            return JsonResponse(
                 {"error": "Invalid username or password"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
@@ -94,7 +184,7 @@ class LoginView(APIView):
 class LogoutView(APIView):
 
     # Use JWT authentication instead of Token authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -125,3 +215,17 @@ class LogoutView(APIView):
                 {"error": "Invalid refresh token", "details": str(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+
+
+# SimpleJWT's token views with rate limits (core/throttling.py)
+# token/ checks a password like login/, so it shares login's limit
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    throttle_scope = "login"
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    throttle_scope = "token"
+
+
+class TokenVerifyView(jwt_views.TokenVerifyView):
+    throttle_scope = "token"
@@ -75,7 +75,9 @@ INSTALLED_APPS = [
     # This is required for secure logout functionality
     "rest_framework_simplejwt.token_blacklist",
     "kothachahiyo",
-    "culture_tourism"
+    "culture_tourism",
+    # Shared helpers (pagination, etc.) used by the apps above
+    "core",
 ]
 
 MIDDLEWARE = [
@@ -168,12 +170,27 @@ else:
 REST_FRAMEWORK = {
     # Default authentication method - JWT (JSON Web Token)
     # JWT tokens are more secure and scalable than regular tokens
+    # (SimpleJWT's JWTAuthentication with an in-process user cache, which
+    # saves the user query on most requests - see account/authentication.py)
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "account.authentication.CachedJWTAuthentication",
     ),
     # Default permission - users must be authenticated to access API
     # This can be overridden in individual views if needed
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # Rate limiting (core/throttling.py): views with a throttle_scope get a
+    # token bucket per user (or per IP when anonymous) at the rate below,
+    # and 429 + Retry-After when it runs out. Views without one aren't limited
+    "DEFAULT_THROTTLE_CLASSES": ("core.throttling.TokenBucketThrottle",),
+    "DEFAULT_THROTTLE_RATES": {
+        # Password checks: login/ and token/
+        "login": config("THROTTLE_LOGIN_RATE", default="10/min"),
+        "register": config("THROTTLE_REGISTER_RATE", default="5/hour"),
+        # token/refresh/ and token/verify/
+        "token": config("THROTTLE_TOKEN_RATE", default="30/min"),
+        # Public culture_tourism catalog
+        "catalog": config("THROTTLE_CATALOG_RATE", default="120/min"),
+    },
 }
 
 # SimpleJWT Configuration
@@ -193,6 +210,9 @@ SIMPLE_JWT = {
     # Blacklist After Rotation: If True, old refresh tokens are blacklisted
     # This prevents reuse of old tokens if they were stolen
     "BLACKLIST_AFTER_ROTATION": True,
+    # Refresh serializer whose blacklist check is answered from memory
+    # (Bloom filter) for tokens that are not blacklisted - see account/blacklist.py
+    "TOKEN_REFRESH_SERIALIZER": "account.serializers.TokenRefreshSerializer",
     # Algorithm used to sign tokens (HS256 is symmetric, RS256 is asymmetric)
     # HS256 is simpler and works well for most applications
     "ALGORITHM": "HS256",
@@ -287,6 +307,55 @@ else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
 
+# Todo delta sync (todo/views.py TodoSyncView)
+# Changes younger than this many seconds wait for the next sync
+TODO_SYNC_SETTLE_SECONDS = config("TODO_SYNC_SETTLE_SECONDS", default=2, cast=float)
+# Tombstones (deleted todos) are kept this long, see purge_tombstones;
+# older sync tokens get 410 Gone and the client syncs from scratch
+TODO_TOMBSTONE_RETENTION_DAYS = config(
+    "TODO_TOMBSTONE_RETENTION_DAYS", default=30, cast=int
+)
+
+# Todo reminders (todo/reminders.py, run_reminders): e-mail them to the
+# todo owner (todo/delivery.py) through the EMAIL_* settings
+TODO_REMINDER_EMAILS = config("TODO_REMINDER_EMAILS", default=False, cast=bool)
+EMAIL_HOST = config("EMAIL_HOST", default="localhost")
+EMAIL_PORT = config("EMAIL_PORT", default=25, cast=int)
+EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
+EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
+EMAIL_USE_TLS = config("EMAIL_USE_TLS", default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="webmaster@localhost")
+
+# List endpoints build JSON from .values() rows through compiled serializers
+# (core/fastpath.py); False serializes model instances with DRF instead
+COMPILED_SERIALIZERS = config("COMPILED_SERIALIZERS", default=True, cast=bool)
+
+# Prerendered catalog snapshots (culture_tourism/prerender.py)
+# Static JSON copies of the catalog API that nginx can serve directly
+# Build with: python manage.py prerender_catalog
+CATALOG_SNAPSHOT_ROOT = config(
+    "CATALOG_SNAPSHOT_ROOT", default=str(BASE_DIR / "catalog_snapshots")
+)
+# Re-render the affected files after every catalog write
+CATALOG_SNAPSHOTS_ENABLED = config("CATALOG_SNAPSHOTS_ENABLED", default=False, cast=bool)
+# Host/scheme used for absolute URLs (images, next links) inside the files
+CATALOG_SNAPSHOT_HOST = config("CATALOG_SNAPSHOT_HOST", default="api.hamrosubidha.com")
+CATALOG_SNAPSHOT_SECURE = config("CATALOG_SNAPSHOT_SECURE", default=True, cast=bool)
+
+# Password hashing for login/register runs in a process pool (account/hashing.py)
+# Processes doing the hashing, per web worker process
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=2, cast=int)
+# Hashes running or waiting before new logins get 503 + Retry-After
+PASSWORD_HASH_MAX_PENDING = config("PASSWORD_HASH_MAX_PENDING", default=16, cast=int)
+
+# Where the rate limit buckets live (core/throttling.py)
+# 'local': in each worker process (fastest; limits apply per process)
+# 'sqlite': in a SQLite file shared by all the worker processes of a host
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="local")
+RATE_LIMIT_SQLITE_PATH = config(
+    "RATE_LIMIT_SQLITE_PATH", default=str(BASE_DIR / "ratelimit.sqlite3")
+)
+
 # Security Settings for Production
 if ENVIRONMENT == "production":
     # Security settings that should be enabled in production
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+
+    def ready(self):
+        # Register signal handlers (image derivatives on save)
+        from . import signals
+
+        signals.connect()
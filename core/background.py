@@ -0,0 +1,64 @@
+"""
+Per-process background flush threads
+
+Some work is queued in memory by requests and written by a thread of its
+own: token rotation rows (account/rotation.py), prerendered catalog files
+(culture_tourism/prerender.py). BackgroundWorker is what they share:
+
+- the daemon thread starts on first use, once per process, and again in
+  a forked worker (which inherits the object but not the thread)
+- it calls flush() when woken with wake(), or every `interval` seconds
+- flush() runs once more at exit (atexit) for whatever is still queued
+
+Subclasses implement flush() and call start() before queueing work.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from django.db import close_old_connections
+
+
+class BackgroundWorker:
+    thread_name = "background-worker"
+    # Seconds between flushes when nobody calls wake(); None: wake() only
+    interval = None
+    # Logged (in the subclass's module) when flush() raises in the thread
+    failure_message = "Background flush failed"
+
+    def __init__(self):
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def start(self):
+        # Once per process (again in a forked worker)
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(
+                target=self._run, name=self.thread_name, daemon=True
+            ).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        logger = logging.getLogger(type(self).__module__)
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(self.failure_message)
+
+    def flush(self):
+        raise NotImplementedError
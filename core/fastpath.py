@@ -0,0 +1,231 @@
+"""
+Compiled read-only serializers for list endpoints
+
+CompiledSerializer looks at a ModelSerializer's fields once and then builds
+list payloads straight from queryset.values() rows: no model instances,
+no per-row get_attribute() walk. Each value still goes through the bound
+field's own to_representation(), so the output is identical to
+serializer.data (checked by `manage.py benchmark_serializers`).
+
+Supported fields: model columns (any DRF field type), file/image fields
+(including ImageVariantsField), primary key related fields, dotted sources
+across non-null foreign keys ("city.name") and reverse foreign keys
+serialized with many=True (loaded with one extra query per batch).
+Anything else (SerializerMethodField, source="*", properties) raises
+TypeError when compiling, so the opt-in fails loudly instead of drifting.
+
+    compiled = CompiledSerializer(TodoSerializer(context=...))
+    rows = compiled.values(queryset)        # a .values() queryset
+    data = compiled.serialize(list(rows))   # list of dicts
+
+Generic list views opt in with CompiledListMixin and
+compiled_serializer = True. settings.COMPILED_SERIALIZERS = False turns
+compiling off everywhere: compile_serializer() then returns a
+PlainSerializer, the same interface over model instances and DRF's own
+serializer.data, and CompiledListMixin uses the plain ListAPIView list().
+"""
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import relations, serializers
+from rest_framework.response import Response
+
+# Fields whose to_representation() returns str/int values unchanged
+_IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+def _is_identity(field):
+    if type(field) in _IDENTITY_FIELDS:
+        return True
+    if type(field) is serializers.ChoiceField:
+        return all(isinstance(key, str) for key in field.choices)
+    return False
+
+
+class CompiledSerializer:
+    def __init__(self, serializer):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        self.model = serializer.Meta.model
+        opts = self.model._meta
+        self.pk_name = opts.pk.attname
+
+        # values() keys needed, and per output field:
+        # (name, values() key, converter or None, convert None values too)
+        self.columns = {self.pk_name}
+        self.plan = []
+        # (name, CompiledSerializer, related model, fk attname)
+        self.nested = []
+
+        for field in serializer._readable_fields:
+            self._compile_field(opts, field)
+
+    def _compile_field(self, opts, field):
+        name = field.field_name
+        source = field.source
+        if source == "*" or isinstance(field, serializers.SerializerMethodField):
+            raise TypeError(f"Field {name!r} cannot be compiled (source='*')")
+
+        attrs = source.split(".")
+        model_field = self._resolve(opts, attrs, name)
+
+        if isinstance(field, serializers.ListSerializer):
+            if not (model_field.one_to_many and len(attrs) == 1):
+                raise TypeError(f"Nested field {name!r} must be a reverse foreign key")
+            child = CompiledSerializer(field.child)
+            fk_attname = model_field.field.attname
+            child.columns.add(fk_attname)
+            self.nested.append((name, child, model_field.related_model, fk_attname))
+            # Placeholder keeps the field order, filled by _attach_nested()
+            self.plan.append((name, None, None, False))
+            return
+        if isinstance(field, serializers.BaseSerializer):
+            raise TypeError(f"Nested field {name!r} is not supported")
+
+        key = "__".join(attrs)
+        self.columns.add(key)
+
+        if isinstance(model_field, models.FileField):
+            # DRF gets a FieldFile (never None) for file columns
+            self.plan.append(
+                (name, key, self._file_converter(field, model_field), True)
+            )
+        elif isinstance(field, relations.PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                self.plan.append((name, key, field.pk_field.to_representation, False))
+            else:
+                self.plan.append((name, key, None, False))
+        elif _is_identity(field):
+            self.plan.append((name, key, None, False))
+        else:
+            self.plan.append((name, key, field.to_representation, False))
+
+    def _resolve(self, opts, attrs, name):
+        model_field = None
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                raise TypeError(f"Field {name!r} does not read a model column")
+            if index < len(attrs) - 1:
+                # DRF would skip the key on a null relation; values() cannot
+                if not model_field.many_to_one or model_field.null:
+                    raise TypeError(f"Field {name!r} crosses a nullable relation")
+                opts = model_field.related_model._meta
+        return model_field
+
+    @staticmethod
+    def _file_converter(field, model_field):
+        attr_class = model_field.attr_class
+
+        def convert(value):
+            return field.to_representation(attr_class(None, model_field, value))
+
+        return convert
+
+    def values(self, queryset, *extra):
+        """
+        queryset.values() with every column needed, plus ORDER BY names
+        and any extra names the caller reads itself
+        """
+        columns = self.columns.union(extra)
+        for term in queryset.query.order_by:
+            if isinstance(term, str):
+                columns.add(term.lstrip("-"))
+        return (
+            queryset.select_related(None)
+            .prefetch_related(None)
+            .values(*sorted(columns))
+        )
+
+    def serialize(self, rows):
+        """rows (list of values() dicts) -> list of output dicts"""
+        plan = self.plan
+        data = []
+        for row in rows:
+            item = {}
+            for name, key, convert, convert_none in plan:
+                value = row[key] if key is not None else None
+                if convert is None or (value is None and not convert_none):
+                    item[name] = value
+                else:
+                    item[name] = convert(value)
+            data.append(item)
+
+        if self.nested and rows:
+            self._attach_nested(rows, data)
+        return data
+
+    def _attach_nested(self, rows, data):
+        ids = [row[self.pk_name] for row in rows]
+        for name, child, related_model, fk_attname in self.nested:
+            ordering = related_model._meta.ordering or [related_model._meta.pk.attname]
+            child_rows = list(
+                child.values(
+                    related_model._default_manager.filter(
+                        **{f"{fk_attname}__in": ids}
+                    ).order_by(*ordering)
+                )
+            )
+            grouped = {pk: [] for pk in ids}
+            for child_row, child_item in zip(child_rows, child.serialize(child_rows)):
+                grouped[child_row[fk_attname]].append(child_item)
+            for item, pk in zip(data, ids):
+                item[name] = grouped[pk]
+
+
+class PlainSerializer:
+    """CompiledSerializer's interface, serializing model instances with DRF"""
+
+    def __init__(self, serializer):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        self.serializer = serializer
+
+    def values(self, queryset, *extra):
+        # Instances carry every column, extra ones included
+        return queryset
+
+    def serialize(self, rows):
+        return type(self.serializer)(
+            rows, many=True, context=self.serializer.context
+        ).data
+
+
+def compiling_enabled():
+    return getattr(settings, "COMPILED_SERIALIZERS", True)
+
+
+def compile_serializer(serializer, enabled=True):
+    """CompiledSerializer, or PlainSerializer when compiling is switched off"""
+    if enabled and compiling_enabled():
+        return CompiledSerializer(serializer)
+    return PlainSerializer(serializer)
+
+
+class CompiledListMixin:
+    """
+    ListAPIView mixin: list() through CompiledSerializer (same output)
+    Only for views with compiled_serializer = True; the others (and all of
+    them when settings.COMPILED_SERIALIZERS is off) use ListAPIView's list()
+    """
+
+    compiled_serializer = False
+
+    def list(self, request, *args, **kwargs):
+        if not (self.compiled_serializer and compiling_enabled()):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = CompiledSerializer(self.get_serializer(many=True))
+        rows = compiled.values(queryset)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(list(rows)))
@@ -0,0 +1,327 @@
+"""
+Image derivatives - resized WebP/JPEG variants and blur placeholders
+
+For every source image we generate, once:
+- sized variants ("thumb", "card", "detail") in WebP and JPEG,
+  auto-rotated from EXIF and saved without any metadata
+- a tiny blurred WebP placeholder (LQIP) inlined as a data: URI
+
+Results are stored next to the media files, keyed by the SHA-256 of the
+source bytes, so identical uploads share one set of derivatives:
+
+    derivatives/<hash[:2]>/<hash>/<variant>.<webp|jpg>
+    derivatives/<hash[:2]>/<hash>/manifest.json
+    derivatives/names/<sha1(source name)>.json   (source name -> manifest)
+
+Those paths never change: files are replaced in place (_put()), so
+concurrent builds of the same image can't leave suffixed copies behind.
+
+Derivatives are built when the image is saved: room uploads build them
+in the upload threads once the upload has committed
+(kothachahiyo/uploads.py), other saves of the IMAGE_FIELDS models once
+their transaction has committed (core/signals.py).
+`python manage.py build_image_derivatives` builds whatever is missing
+(existing images, failed builds).
+
+Serializers only read them (get_derivatives(): one small storage read
+per image and process, then memory) and show null until they exist.
+"""
+
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+
+# name -> bounding box; images are shrunk to fit, never enlarged
+VARIANTS = {
+    "thumb": (160, 160),
+    "card": (480, 480),
+    "detail": (1080, 1080),
+}
+
+# format -> (Pillow format, file extension, save options)
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+PLACEHOLDER_WIDTH = 16
+
+# Manifests kept in memory per process, and how long "not built yet" is
+# believed before storage is checked again
+CACHE_SIZE = 4096
+MISSING_TTL = 60
+
+# Sent (sender: the model holding the image, when known) with name= and
+# manifest= once build_for_name() has stored the derivatives of an image,
+# so caches holding it without them can be renewed
+derivatives_built = Signal()
+
+# Every model image field that gets derivatives (used by the build command)
+IMAGE_FIELDS = [
+    ("kothachahiyo.RoomImage", "image"),
+    ("culture_tourism.Cities", "thumbnail"),
+    ("culture_tourism.Tourism", "image"),
+    ("culture_tourism.TripPlanner", "banner"),
+    ("culture_tourism.CultureAndTradition", "image"),
+    ("culture_tourism.Food", "image"),
+]
+
+
+def _name_index_path(name):
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return f"{DERIVATIVES_DIR}/names/{digest}.json"
+
+
+def _hash_dir(content_hash):
+    return f"{DERIVATIVES_DIR}/{content_hash[:2]}/{content_hash}"
+
+
+def _read_json(storage, path):
+    if not storage.exists(path):
+        return None
+    with storage.open(path, "rb") as handle:
+        return json.loads(handle.read())
+
+
+def _put(storage, path, data):
+    """
+    Store data at exactly path, replacing any file already there
+    Returns the stored name.
+
+    Local storage writes a temporary file next to it and os.replace()s it
+    over path: readers never see a partial file, and concurrent writers
+    (threads or processes) of the same path both end up with it instead
+    of a suffixed copy from storage.save(). Storages without local paths
+    delete and save.
+    """
+    try:
+        target = storage.path(path)
+    except NotImplementedError:
+        if storage.exists(path):
+            storage.delete(path)
+        return storage.save(path, ContentFile(data))
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, "wb") as handle:
+            handle.write(data)
+        mode = getattr(storage, "file_permissions_mode", None)
+        if mode is not None:
+            os.chmod(temporary, mode)
+        os.replace(temporary, target)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary)
+        raise
+    return path
+
+
+def _write_json(storage, path, data):
+    return _put(storage, path, json.dumps(data).encode())
+
+
+def _normalize(image):
+    """
+    RGB (or RGBA when there is transparency) copy of the image
+    Resizing and blurring need it: palette, 1-bit and 16-bit images would
+    fail or resize with nearest neighbour only
+    """
+    if image.mode in ("RGB", "RGBA"):
+        return image
+    if image.mode in ("I", "I;16", "I;16B", "I;16L", "F"):
+        # 16-bit greyscale down to 8 bits (a plain convert clips to white)
+        return image.convert("I").point(lambda value: value * (1 / 256)).convert("RGB")
+    if "A" in image.getbands() or "transparency" in image.info:
+        return image.convert("RGBA")
+    return image.convert("RGB")
+
+
+def _flatten(image):
+    """RGB copy for JPEG (transparent areas become white)"""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _encode(image, fmt):
+    pillow_format, _, options = FORMATS[fmt]
+    if pillow_format == "JPEG":
+        image = _flatten(image)
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    buffer = io.BytesIO()
+    # No exif=/icc_profile= here: the output carries no metadata
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def _placeholder(image):
+    small = image.copy()
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    small = small.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, "WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+# Builds of one content hash run one at a time per process (identical
+# uploads often arrive together); a fixed set of locks picked by hash
+_build_locks = [threading.Lock() for _ in range(64)]
+
+
+def _build_lock(content_hash):
+    return _build_locks[int(content_hash[:8], 16) % len(_build_locks)]
+
+
+def build_derivatives(data, storage=default_storage):
+    """
+    Generate (or reuse) the derivatives for raw image bytes
+    Returns the manifest dict stored alongside them.
+    """
+    content_hash = hashlib.sha256(data).hexdigest()
+    manifest_path = f"{_hash_dir(content_hash)}/manifest.json"
+
+    manifest = _read_json(storage, manifest_path)
+    if manifest is not None:
+        return manifest
+
+    with _build_lock(content_hash):
+        # Built by another thread while this one waited
+        manifest = _read_json(storage, manifest_path)
+        if manifest is None:
+            manifest = _build(data, content_hash, storage)
+    return manifest
+
+
+def _build(data, content_hash, storage):
+    directory = _hash_dir(content_hash)
+    image = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder downscale while decoding when it can
+    image.draft("RGB", max(VARIANTS.values()))
+    image = _normalize(ImageOps.exif_transpose(image))
+
+    manifest = {
+        "hash": content_hash,
+        "placeholder": _placeholder(image),
+        "variants": {},
+    }
+    for variant, box in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.Resampling.LANCZOS)
+        entry = {"width": resized.width, "height": resized.height}
+        for fmt, (_, extension, _) in FORMATS.items():
+            # Always the same name: another process building the same
+            # hash replaces the file with identical bytes
+            entry[fmt] = _put(
+                storage, f"{directory}/{variant}.{extension}", _encode(resized, fmt)
+            )
+        manifest["variants"][variant] = entry
+
+    # Written last: its presence means every variant is in place
+    _write_json(storage, f"{directory}/manifest.json", manifest)
+    return manifest
+
+
+_lock = threading.Lock()
+# source name -> (manifest or None, time looked up)
+_manifests = {}
+
+
+def _remember(name, manifest):
+    with _lock:
+        if len(_manifests) >= CACHE_SIZE:
+            # Oldest insertion first
+            _manifests.pop(next(iter(_manifests)))
+        _manifests[name] = (manifest, time.monotonic())
+
+
+def _read_manifest(name):
+    index = _read_json(default_storage, _name_index_path(name))
+    if index is None:
+        return None
+    if "manifest" in index:
+        return index["manifest"]
+    # Index written before it carried the manifest
+    return _read_json(default_storage, f"{_hash_dir(index['hash'])}/manifest.json")
+
+
+def build_for_name(name, sender=None):
+    """
+    Build (or reuse) the derivatives of a stored image
+    sender: model whose image field holds name (sent with derivatives_built)
+    Returns the manifest, None when the file can't be read as an image
+    (logged)
+    """
+    try:
+        with default_storage.open(name, "rb") as handle:
+            data = handle.read()
+        manifest = build_derivatives(data)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not build derivatives for %s: %s", name, exc)
+        return None
+    _write_json(
+        default_storage,
+        _name_index_path(name),
+        {"name": name, "hash": manifest["hash"], "manifest": manifest},
+    )
+    # Replaces this process's "not built yet" entry; other processes keep
+    # theirs for up to MISSING_TTL
+    _remember(name, manifest)
+    derivatives_built.send(sender=sender, name=name, manifest=manifest)
+    return manifest
+
+
+def build_for_file(field_file):
+    """build_for_name() for a FieldFile; None when the field is empty"""
+    name = field_file.name if field_file else None
+    if not name:
+        return None
+    return build_for_name(name, sender=type(field_file.instance))
+
+
+def get_derivatives(field_file):
+    """
+    Manifest for a FieldFile/ImageFieldFile, None when the field is empty
+    or the derivatives have not been built (never builds them)
+    """
+    name = field_file.name if field_file else None
+    if not name:
+        return None
+
+    entry = _manifests.get(name)
+    if entry is not None:
+        manifest, checked = entry
+        if manifest is not None or time.monotonic() - checked < MISSING_TTL:
+            return manifest
+
+    try:
+        manifest = _read_manifest(name)
+    except (OSError, ValueError) as exc:
+        logger.warning("Could not read derivatives of %s: %s", name, exc)
+        manifest = None
+    _remember(name, manifest)
+    return manifest
+
+
+def has_derivatives(name):
+    return default_storage.exists(_name_index_path(name))
@@ -0,0 +1,148 @@
+"""
+Compare DRF serializers with the compiled read path (core.fastpath)
+
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --rows 1000 10000 --repeat 5
+
+Creates throwaway todos, rooms (two images each) and food rows inside a
+transaction that is rolled back at the end, then renders each list both
+ways. The JSON bytes must be identical; the command fails otherwise.
+Timings include the queries and JSON rendering, best of --repeat runs.
+All rows share one image name so derivative lookups stay cached.
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.fastpath import CompiledSerializer
+from culture_tourism.models import Food
+from culture_tourism.serializers import FoodSerializer
+from kothachahiyo.models import Room, RoomImage
+from kothachahiyo.serializers import RoomSerializer
+from todo.models import Todo
+from todo.serializers import TodoSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the compiled list serializers against DRF (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["rows"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        user = User.objects.create(username="benchmark-serializers")
+        created = 0
+        for size in sorted(sizes):
+            self.create_rows(user, size - created)
+            created = size
+
+            cases = [
+                (
+                    "todo",
+                    TodoSerializer,
+                    Todo.objects.filter(user=user).order_by("-created_at", "-id"),
+                ),
+                (
+                    "room",
+                    RoomSerializer,
+                    Room.objects.filter(user=user)
+                    .order_by("-id")
+                    .prefetch_related("room_images"),
+                ),
+                (
+                    "food",
+                    FoodSerializer,
+                    Food.objects.filter(name__startswith="benchmark-").order_by("id"),
+                ),
+            ]
+            for label, serializer_class, queryset in cases:
+                self.compare(label, size, serializer_class, queryset, repeat)
+
+    def create_rows(self, user, count):
+        todos = [
+            Todo(user=user, title=f"Todo {i}", description="x" * 200)
+            for i in range(count)
+        ]
+        Todo.objects.bulk_create(todos, batch_size=1000)
+
+        rooms = Room.objects.bulk_create(
+            [
+                Room(
+                    user=user,
+                    title=f"Room {i}",
+                    content="y" * 200,
+                    price=1000 + i % 5000,
+                    mobile_number="9800000000",
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        # Backends without RETURNING leave pks unset: load them back
+        if rooms and rooms[0].pk is None:
+            rooms = list(Room.objects.filter(user=user, room_images__isnull=True))
+        RoomImage.objects.bulk_create(
+            [
+                RoomImage(room=room, image="room/images/benchmark.jpg")
+                for room in rooms
+                for _ in range(2)
+            ],
+            batch_size=1000,
+        )
+
+        Food.objects.bulk_create(
+            [
+                Food(name=f"benchmark-{i}", image="food_image/benchmark.jpg", about="z")
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+
+    def compare(self, label, size, serializer_class, queryset, repeat):
+        renderer = JSONRenderer()
+
+        def drf():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def compiled():
+            serializer = CompiledSerializer(serializer_class(many=True))
+            rows = list(serializer.values(queryset.all()))
+            return renderer.render(serializer.serialize(rows))
+
+        expected, drf_time = self.measure(drf, repeat)
+        actual, compiled_time = self.measure(compiled, repeat)
+        if actual != expected:
+            raise CommandError(f"{label} x {size}: compiled output differs from DRF")
+
+        self.stdout.write(
+            f"{label:>5} x {size:>6}: drf {drf_time * 1000:9.1f} ms  "
+            f"compiled {compiled_time * 1000:9.1f} ms  "
+            f"{drf_time / compiled_time:5.1f}x  ({len(expected)} bytes, identical)"
+        )
+
+    @staticmethod
+    def measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,42 @@
+"""
+Build image derivatives that are missing
+
+    python manage.py build_image_derivatives
+
+Walks every image field listed in core.images.IMAGE_FIELDS and generates
+the variants of images that have none yet: images stored before
+derivatives existed, or whose build at save time failed.
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_FIELDS, build_for_name, has_derivatives
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails, WebP/JPEG variants and placeholders for all images"
+
+    def handle(self, *args, **options):
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            names = (
+                model._default_manager.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list(field_name, flat=True)
+                .iterator()
+            )
+
+            built = ready = failed = 0
+            for name in names:
+                if has_derivatives(name):
+                    ready += 1
+                elif build_for_name(name, sender=model) is None:
+                    failed += 1
+                else:
+                    built += 1
+
+            self.stdout.write(
+                f"{label}.{field_name}: {built} built, {ready} already built,"
+                f" {failed} failed"
+            )
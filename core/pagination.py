@@ -0,0 +1,244 @@
+"""
+Shared pagination classes for list endpoints
+These follow DRF's BasePagination interface so they work both from
+APIView subclasses (called by hand) and generic views (pagination_class)
+"""
+
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _positive_int(value, default, cutoff=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    if number < 1:
+        return default
+    if cutoff:
+        return min(number, cutoff)
+    return number
+
+
+class PagePagination(BasePagination):
+    """
+    Page number pagination with a capped page size and an optional total count
+
+    - ?page=<n>          page to return (1-based)
+    - ?page_size=<n>     rows per page, capped at max_page_size
+    - ?count=false       skip the COUNT(*) query (count is returned as null)
+
+    The page is fetched with a single LIMIT/OFFSET query that asks for one
+    extra row, so "next" is known without counting the whole table.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_query_param = "page"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_number = _positive_int(
+            request.query_params.get(self.page_query_param), 1
+        )
+        self.page_size_value = self.get_page_size(request)
+
+        offset = (self.page_number - 1) * self.page_size_value
+        rows = list(queryset[offset : offset + self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+
+        if self.include_count(request):
+            self.count = queryset.count()
+        else:
+            self.count = None
+
+        if not rows and self.page_number > 1:
+            raise NotFound("Invalid page.")
+
+        return rows[: self.page_size_value]
+
+    def get_page_size(self, request):
+        return _positive_int(
+            request.query_params.get(self.page_size_query_param),
+            self.page_size,
+            cutoff=self.max_page_size,
+        )
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param, "true")
+        return value.lower() not in ("0", "false", "no")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "data": data,
+            }
+        )
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination for infinite scroll
+
+    - ?cursor=<opaque>   value of "next" from the previous page
+    - ?page_size=<n>     rows per page, capped at max_page_size
+
+    The cursor holds the sort key of the last row sent, and the next page
+    is fetched with WHERE (sort key) < (cursor) ORDER BY ... LIMIT n, so
+    every page costs the same no matter how deep the client scrolls.
+
+    The sort order is taken from the queryset's order_by(); the primary key
+    is appended when missing so the order is total. Rows may be model
+    instances or dicts (.values() querysets).
+
+    Cursors come from the client: one that isn't a list of values the sort
+    fields accept (forged, or from another sort order) is a 404.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+
+        queryset = self.order_queryset(queryset)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[: self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+
+        if self.has_next:
+            self.next_position = [self.get_value(rows[-1], f) for f, _ in self.keys]
+        else:
+            self.next_position = None
+        return rows
+
+    def get_page_size(self, request):
+        return _positive_int(
+            request.query_params.get(self.page_size_query_param),
+            self.page_size,
+            cutoff=self.max_page_size,
+        )
+
+    def order_queryset(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(term, str) for term in ordering):
+            raise TypeError("KeysetPagination only supports field name ordering")
+
+        pk_name = queryset.model._meta.pk.attname
+        names = [term.lstrip("-") for term in ordering]
+        if not names or names[-1] not in ("pk", pk_name):
+            descending = ordering[-1].startswith("-") if ordering else True
+            ordering.append(("-" if descending else "") + pk_name)
+
+        # [(field, descending), ...]
+        self.keys = []
+        for term in ordering:
+            field = term.lstrip("-")
+            self.keys.append((pk_name if field == "pk" else field, term[0] == "-"))
+        # Model (or annotation) fields, to check the values in a cursor
+        annotations = queryset.query.annotations
+        self.key_fields = [
+            (
+                annotations[field].output_field
+                if field in annotations
+                else queryset.model._meta.get_field(field)
+            )
+            for field, _ in self.keys
+        ]
+        return queryset.order_by(*ordering)
+
+    def after(self, position):
+        """Q object selecting the rows that sort strictly after position"""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.keys):
+            lookup = "lt" if descending else "gt"
+            step = Q(**{f"{field}__{lookup}": position[index]})
+            for previous, (previous_field, _) in enumerate(self.keys[:index]):
+                step &= Q(**{previous_field: position[previous]})
+            condition |= step
+        return condition
+
+    def get_value(self, row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    def signature(self):
+        return ",".join(("-" if desc else "") + field for field, desc in self.keys)
+
+    def encode_cursor(self, position):
+        payload = json.dumps([self.signature(), position], default=str)
+        return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            signature, position = json.loads(urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor is only valid for the sort order that produced it
+        if (
+            signature != self.signature()
+            or not isinstance(position, list)
+            or len(position) != len(self.keys)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.key_fields, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "data": data})
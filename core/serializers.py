@@ -0,0 +1,55 @@
+"""
+Shared serializer fields
+"""
+
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from .images import get_derivatives
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only field exposing the derivatives of an image field
+
+    Usage: image_variants = ImageVariantsField(source="image")
+
+    Output (null when there is no image, or its derivatives have not been
+    built yet: this only reads them, see core/images.py):
+        {
+            "thumb":  {"webp": url, "jpeg": url, "width": 160, "height": 120},
+            "card":   {...},
+            "detail": {...},
+            "placeholder": "data:image/webp;base64,..."
+        }
+
+    URLs are absolute when the serializer has the request in its context,
+    like DRF's ImageField.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, value):
+        manifest = get_derivatives(value)
+        if manifest is None:
+            return None
+
+        data = {}
+        for variant, entry in manifest["variants"].items():
+            data[variant] = {
+                "webp": self._url(entry["webp"]),
+                "jpeg": self._url(entry["jpeg"]),
+                "width": entry["width"],
+                "height": entry["height"],
+            }
+        data["placeholder"] = manifest["placeholder"]
+        return data
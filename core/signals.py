@@ -0,0 +1,36 @@
+"""
+Build image derivatives when a model image is saved
+Connected in CoreConfig.ready() for every model in images.IMAGE_FIELDS.
+Room uploads go through bulk_create (no signal) and are built on commit by
+kothachahiyo/uploads.py instead.
+"""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .images import IMAGE_FIELDS, build_for_name, get_derivatives
+
+
+def image_saved(sender, instance, field_name, **kwargs):
+    field_file = getattr(instance, field_name)
+    # Nothing to do for an empty field or an image built before
+    if get_derivatives(field_file) is not None or not field_file:
+        return
+    # Once committed: a rolled back upload has nothing to build
+    name = field_file.name
+    transaction.on_commit(lambda: build_for_name(name, sender=sender))
+
+
+def connect():
+    for label, field_name in IMAGE_FIELDS:
+
+        def receiver(sender, instance, field_name=field_name, **kwargs):
+            image_saved(sender, instance, field_name, **kwargs)
+
+        post_save.connect(
+            receiver,
+            sender=apps.get_model(label),
+            weak=False,
+            dispatch_uid=f"image_derivatives_{label}_{field_name}",
+        )
@@ -0,0 +1,110 @@
+"""
+Sparse fieldsets: ?fields=a,b keeps only those fields, ?omit=a,b drops them
+
+The same projection is pushed into the queryset with .only(), so columns
+the client did not ask for are never read from the database.
+
+- SparseFieldsetMixin: serializer mixin that trims its fields
+- sparse_queryset(): restricts a queryset to the columns a serializer reads
+- SparseQuerysetMixin: generic view mixin applying sparse_queryset()
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+
+def _names(params, key):
+    value = params.get(key) or ""
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin reading ?fields= / ?omit= from the context
+
+    The query parameters come from context["request"] (GET/HEAD only) or,
+    for views that do not pass the request, from context["query_params"].
+    Only the top-level serializer is trimmed; nested ones are left alone.
+    Unknown names are ignored.
+    """
+
+    def get_sparse_params(self):
+        request = self.context.get("request")
+        if request is not None:
+            if request.method not in SAFE_METHODS:
+                return None
+            return request.query_params
+        return self.context.get("query_params")
+
+    def is_root_serializer(self):
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        params = self.get_sparse_params()
+        if not params or not self.is_root_serializer():
+            return fields
+
+        wanted = _names(params, FIELDS_PARAM)
+        omitted = _names(params, OMIT_PARAM)
+        for name in list(fields):
+            if (wanted and name not in wanted) or name in omitted:
+                del fields[name]
+        return fields
+
+
+def is_sparse(params):
+    return bool(params) and bool(
+        _names(params, FIELDS_PARAM) or _names(params, OMIT_PARAM)
+    )
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    queryset.only() the columns serializer's fields read (plus the primary
+    key and the ORDER BY columns)
+
+    Returns queryset unchanged when a field reads something that is not a
+    model column (source="*", properties), since its needs are unknown.
+    Reverse relations are skipped: the caller decides what to prefetch.
+    """
+    opts = queryset.model._meta
+    columns = {opts.pk.name}
+
+    for field in serializer.fields.values():
+        if field.source == "*":
+            return queryset
+        try:
+            model_field = opts.get_field(field.source.split(".")[0])
+        except FieldDoesNotExist:
+            return queryset
+        if model_field.concrete:
+            columns.add(model_field.name)
+
+    for term in queryset.query.order_by:
+        if isinstance(term, str):
+            try:
+                model_field = opts.get_field(term.lstrip("-"))
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete:
+                columns.add(model_field.name)
+
+    return queryset.only(*columns)
+
+
+class SparseQuerysetMixin:
+    """Generic view mixin: project get_queryset() on ?fields= / ?omit="""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS and is_sparse(self.request.query_params):
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,148 @@
+"""
+Streaming JSON lists
+
+stream_json_list() sends a queryset as a JSON array without holding the
+whole result in memory: rows are read with .iterator(chunk_size=...),
+serialized one chunk at a time through a CompiledSerializer (or a
+PlainSerializer when compiling is off, see core.fastpath) and written
+to a StreamingHttpResponse as they are ready. Memory stays flat however
+many rows there are.
+
+Each chunk is rendered by DRF's JSONRenderer, so values, escaping and
+separators are exactly those of a normal response.
+
+Under ASGI Django would read a synchronous iterator to the end before
+sending anything, so streaming_response() hands it an asynchronous one
+instead, which fetches each chunk in the request's sync thread
+(sync_to_async) and sends it at once. Under WSGI the generator is used
+as is.
+
+The status line is sent before the first row is read: an error mid-way
+can only cut the body short. It is logged and re-raised, so the server
+aborts the response and the client sees an incomplete body (invalid
+JSON, missing count) rather than a complete-looking one.
+
+- wants_stream(): ?stream=true on the request
+- streaming_response(): StreamingHttpResponse for WSGI and ASGI alike
+- stream_json_list(): the response, optionally inside an envelope
+- StreamingListMixin: generic list views stream when unpaginated
+"""
+
+import logging
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from core.fastpath import compile_serializer
+
+STREAM_PARAM = "stream"
+CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def wants_stream(request):
+    return request.query_params.get(STREAM_PARAM, "").lower() in ("1", "true", "yes")
+
+
+def _logged(content):
+    try:
+        yield from content
+    except Exception:
+        logger.exception("Streamed response failed, the body is truncated")
+        raise
+
+
+async def _async_chunks(chunks):
+    # Thread-sensitive: the chunks are read in the thread the view ran in,
+    # which holds the database connection (and the open cursor)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (chunk := await next_chunk(chunks, done)) is not done:
+        yield chunk
+
+
+def streaming_response(request, content, **kwargs):
+    """StreamingHttpResponse sending content (an iterable of bytes) as it comes"""
+    content = _logged(content)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        content = _async_chunks(content)
+    return StreamingHttpResponse(content, **kwargs)
+
+
+def stream_json_list(
+    request,
+    queryset,
+    compiled,
+    envelope=None,
+    key="data",
+    count_key=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    StreamingHttpResponse with queryset's rows as a JSON array
+
+    envelope: None for a bare array, or a dict of leading keys; the array
+    then goes under key, and the row count under count_key (if given)
+    after it, since it is only known once the last row is sent:
+
+        {"success":true,"data":[...],"count":123}
+    """
+    renderer = JSONRenderer()
+
+    def content():
+        if envelope is None:
+            yield b"["
+        else:
+            head = renderer.render(envelope)[:-1]
+            if envelope:
+                head += b","
+            yield head + renderer.render(key) + b":["
+
+        count = 0
+        rows = compiled.values(queryset).iterator(chunk_size=chunk_size)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            # Render the chunk as one array and drop its brackets
+            chunk = renderer.render(compiled.serialize(batch))[1:-1]
+            yield (b"," + chunk) if count else chunk
+            count += len(batch)
+
+        if envelope is None:
+            yield b"]"
+        elif count_key is None:
+            yield b"]}"
+        else:
+            yield b"]," + renderer.render({count_key: count})[1:]
+
+    return streaming_response(request, content(), content_type=renderer.media_type)
+
+
+class StreamingListMixin:
+    """
+    ListAPIView mixin: unpaginated JSON lists are streamed
+
+    Paginated views and other renderers (browsable API) use the normal
+    list(). Rows go through a CompiledSerializer when the view sets
+    compiled_serializer = True (see core.fastpath).
+    """
+
+    stream_chunk_size = CHUNK_SIZE
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None or request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = compile_serializer(
+            self.get_serializer(many=True),
+            enabled=getattr(self, "compiled_serializer", False),
+        )
+        return stream_json_list(
+            request, queryset, compiled, chunk_size=self.stream_chunk_size
+        )
@@ -0,0 +1,335 @@
+import io
+import json
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from culture_tourism.models import Cities, Food
+from culture_tourism.views import CitiesListAPIView
+
+from . import images, throttling
+from .background import BackgroundWorker
+from .fastpath import CompiledSerializer
+from .streaming import streaming_response
+
+
+def image_bytes(mode, fmt="PNG", size=(64, 48)):
+    image = Image.new(mode, size)
+    if mode == "P":
+        image.putpalette([value % 256 for value in range(768)])
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class ImageDerivativesTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def store(self, data, name="upload.png"):
+        return default_storage.save(f"test/{name}", ContentFile(data))
+
+    def test_every_image_mode_gets_variants(self):
+        sources = {
+            "palette.png": image_bytes("P"),
+            "palette.gif": image_bytes("P", "GIF"),
+            "bilevel.png": image_bytes("1"),
+            "deep.png": image_bytes("I;16"),
+            "alpha.png": image_bytes("RGBA"),
+            "photo.jpg": image_bytes("RGB", "JPEG"),
+        }
+        for name, data in sources.items():
+            with self.subTest(name):
+                manifest = images.build_for_name(self.store(data, name))
+                self.assertIsNotNone(manifest)
+                self.assertTrue(manifest["placeholder"].startswith("data:image/webp"))
+                self.assertEqual(manifest["variants"]["thumb"]["width"], 64)
+
+    def test_get_derivatives_only_reads(self):
+        name = self.store(image_bytes("RGB"))
+        field_file = Cities(thumbnail=name).thumbnail
+        self.assertIsNone(images.get_derivatives(field_file))
+        self.assertFalse(default_storage.exists(images.DERIVATIVES_DIR))
+
+        manifest = images.build_for_name(name)
+        self.assertEqual(images.get_derivatives(field_file), manifest)
+
+    def test_unreadable_image(self):
+        name = self.store(b"not an image", "broken.png")
+        with self.assertLogs("core.images", "WARNING"):
+            self.assertIsNone(images.build_for_name(name))
+
+    def stored_derivatives(self, manifest):
+        directory = images._hash_dir(manifest["hash"])
+        return sorted(default_storage.listdir(directory)[1])
+
+    def test_identical_uploads_share_one_set(self):
+        data = image_bytes("RGB", "JPEG")
+        names = [self.store(data, f"same-{index}.jpg") for index in range(4)]
+        results = {}
+
+        def build(name):
+            results[name] = images.build_for_name(name)
+
+        threads = [threading.Thread(target=build, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        manifests = list(results.values())
+        self.assertTrue(all(manifest == manifests[0] for manifest in manifests))
+        expected = ["manifest.json"] + [
+            f"{variant}.{extension}"
+            for variant in images.VARIANTS
+            for extension in ("jpg", "webp")
+        ]
+        self.assertEqual(self.stored_derivatives(manifests[0]), sorted(expected))
+
+    def test_rebuild_replaces_files_in_place(self):
+        # A second process finding the variants but no manifest yet
+        data = image_bytes("RGBA")
+        first = images.build_derivatives(data)
+        files = self.stored_derivatives(first)
+        default_storage.delete(f"{images._hash_dir(first['hash'])}/manifest.json")
+
+        second = images.build_derivatives(data)
+        self.assertEqual(second, first)
+        self.assertEqual(self.stored_derivatives(second), files)
+
+    def test_built_when_model_is_saved(self):
+        name = self.store(image_bytes("P"), "city.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            city = Cities.objects.create(name="Pokhara", thumbnail=name)
+        self.assertTrue(images.has_derivatives(name))
+        self.assertIsNotNone(images.get_derivatives(city.thumbnail))
+
+
+def broken_chunks():
+    yield b"[1"
+    raise ValueError("database went away")
+
+
+class StreamingResponseTests(SimpleTestCase):
+    def test_wsgi_gets_sync_iterator(self):
+        response = streaming_response(RequestFactory().get("/"), [b"[1", b"]"])
+        self.assertFalse(response.is_async)
+        self.assertEqual(b"".join(response), b"[1]")
+
+    async def test_asgi_gets_async_iterator(self):
+        response = streaming_response(AsyncRequestFactory().get("/"), [b"[1", b"]"])
+        self.assertTrue(response.is_async)
+        self.assertEqual([chunk async for chunk in response], [b"[1", b"]"])
+
+    def test_error_mid_stream_is_logged_and_raised(self):
+        response = streaming_response(RequestFactory().get("/"), broken_chunks())
+        chunks = iter(response)
+        self.assertEqual(next(chunks), b"[1")
+        with self.assertLogs("core.streaming", "ERROR"), self.assertRaises(ValueError):
+            next(chunks)
+
+
+class CompiledListTests(TestCase):
+    def setUp(self):
+        Cities.objects.create(name="Pokhara")
+        Cities.objects.create(name="Bandipur")
+
+    def cities(self):
+        # Unpaginated: streamed
+        response = self.client.get("/api/v1/culture_tourism/cities/")
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_fallbacks_give_the_same_output(self):
+        compiled = self.cities()
+        with mock.patch.object(CitiesListAPIView, "compiled_serializer", False):
+            self.assertEqual(self.cities(), compiled)
+        with override_settings(COMPILED_SERIALIZERS=False), mock.patch.object(
+            CompiledSerializer, "__init__", side_effect=AssertionError
+        ):
+            self.assertEqual(self.cities(), compiled)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        throttling.get_backend().reset()
+        self.food = Food.objects.create(name="Momo", about="Dumplings", history="Old")
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            # Streamed lists run their query while the body is read
+            if response.streaming:
+                data = json.loads(b"".join(response.streaming_content))
+            else:
+                data = response.json()
+        food_selects = [
+            query["sql"]
+            for query in queries.captured_queries
+            if 'FROM "culture_tourism_food"' in query["sql"]
+        ]
+        self.assertEqual(len(food_selects), 1)
+        return data, food_selects[0]
+
+    def list(self, **params):
+        data, sql = self.get("/api/v1/culture_tourism/food/", **params)
+        return data[0], sql
+
+    def detail(self, **params):
+        return self.get(f"/api/v1/culture_tourism/food/{self.food.pk}/", **params)
+
+    def test_fields_and_omit(self):
+        for get in (self.list, self.detail):
+            with self.subTest(get.__name__):
+                row, _ = get(fields="id,name")
+                self.assertEqual(set(row), {"id", "name"})
+                row, _ = get(omit="about, history,image_variants")
+                self.assertEqual(set(row), {"id", "name", "image"})
+
+    def test_unknown_names_are_ignored(self):
+        full, _ = self.list()
+        row, _ = self.list(fields="name,calories")
+        self.assertEqual(set(row), {"name"})
+        row, _ = self.list(omit="calories")
+        self.assertEqual(row, full)
+
+    def test_only_requested_columns_are_read(self):
+        _, sql = self.list()
+        self.assertIn('"history"', sql)
+        for get in (self.list, self.detail):
+            with self.subTest(get.__name__):
+                _, sql = get(fields="name")
+                self.assertIn('"name"', sql)
+                self.assertNotIn('"about"', sql)
+                self.assertNotIn('"history"', sql)
+                self.assertNotIn('"image"', sql)
+                # image_variants reads the image column
+                _, sql = get(fields="name,image_variants")
+                self.assertIn('"image"', sql)
+
+
+class BackgroundWorkerTests(SimpleTestCase):
+    def test_one_thread_per_process(self):
+        flushed = threading.Event()
+
+        class Worker(BackgroundWorker):
+            thread_name = "test-background-worker"
+
+            def flush(self):
+                flushed.set()
+
+        worker = Worker()
+        with mock.patch("core.background.atexit.register") as register:
+            worker.start()
+            worker.start()
+        register.assert_called_once_with(worker.flush)
+        names = [thread.name for thread in threading.enumerate()]
+        self.assertEqual(names.count("test-background-worker"), 1)
+
+        worker.wake()
+        self.assertTrue(flushed.wait(5))
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_take(self):
+        capacity, per_second = throttling.parse_rate("10/min")
+        self.assertEqual((capacity, per_second), (10, 10 / 60))
+        tokens, wait = throttling.take(None, 0, capacity, per_second, now=0)
+        self.assertEqual((tokens, wait), (9, 0))
+        # Empty: one token comes back every 6 seconds
+        tokens, wait = throttling.take(0, 0, capacity, per_second, now=3)
+        self.assertAlmostEqual(wait, 3)
+        tokens, wait = throttling.take(0, 0, capacity, per_second, now=600)
+        self.assertEqual((tokens, wait), (9, 0))
+
+    def assert_limits(self, backend):
+        waits = [backend.consume("login:ip:1", 3, 1 / 60) for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 59)
+        # Another client has its own bucket
+        self.assertEqual(backend.consume("login:ip:2", 3, 1 / 60), 0)
+
+    def test_local_backend(self):
+        self.assert_limits(throttling.LocalBackend())
+
+    def test_sqlite_backend_is_shared(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f"{directory}/ratelimit.sqlite3"
+        self.assert_limits(throttling.SQLiteBackend(path))
+        # A second process sees the same buckets
+        self.assertGreater(
+            throttling.SQLiteBackend(path).consume("login:ip:1", 3, 1 / 60), 0
+        )
+
+    def test_sqlite_backend_fails_open(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        backend = throttling.SQLiteBackend(directory)
+        with self.assertLogs("core.throttling", "ERROR"):
+            self.assertEqual(backend.consume("login:ip:1", 1, 1), 0)
+
+
+@override_settings(
+    REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {"test": "2/min"}},
+)
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.backend = throttling.SQLiteBackend(f"{directory}/ratelimit.sqlite3")
+        patcher = mock.patch.object(throttling, "_backend", self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_view_keeps_sqlite_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+        consume = self.backend.consume
+
+        def record(*args):
+            threads.append(threading.get_ident())
+            return consume(*args)
+
+        @throttling.rate_limit("test")
+        async def view(request):
+            return HttpResponse("ok")
+
+        request = AsyncRequestFactory().post("/")
+        with mock.patch.object(self.backend, "consume", record):
+            statuses = [(await view(request)).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertNotIn(loop_thread, threads)
+
+    def test_sync_view(self):
+        @throttling.rate_limit("test")
+        def view(request):
+            return HttpResponse("ok")
+
+        request = RequestFactory().post("/")
+        responses = [view(request) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertEqual(responses[2]["Retry-After"], "30")
+
+        request.skip_throttle = True
+        self.assertEqual(view(request).status_code, 200)
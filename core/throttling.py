@@ -0,0 +1,278 @@
+"""
+Token-bucket rate limiting
+
+Every scope ("login", "register", "token", "catalog", ...) has a rate in
+REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], written the DRF way: "10/min".
+Each client gets a bucket per scope holding up to that many requests,
+refilled continuously at the same rate, so short bursts pass and a steady
+stream is held to the rate. Clients are the user id when authenticated,
+the IP address (see DRF's NUM_PROXIES) otherwise.
+
+- TokenBucketThrottle: DRF throttle, limits views with a throttle_scope
+  and lets the rest through at the cost of one getattr.
+- rate_limit(scope): the same for plain Django views (the async login and
+  registration views). In async views a blocking backend (SQLite) runs in
+  a worker thread, never on the event loop.
+- A throttled request gets 429 with Retry-After.
+
+Backends (RATE_LIMIT_BACKEND):
+- "local": buckets in a dict in this process. A couple of microseconds
+  per request; with N worker processes a client effectively gets N times
+  the rate.
+- "sqlite": buckets in a SQLite file (RATE_LIMIT_SQLITE_PATH) shared by
+  every worker process on the host, tens of microseconds per request. If
+  the file can't be used requests are let through, not failed.
+
+Requests with skip_throttle set (prerender.render()'s internal ones) are
+never limited.
+"""
+
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+# Buckets kept by the local backend before idle full ones are dropped
+LOCAL_MAX_BUCKETS = 100_000
+# Seconds between sweeps of idle buckets in the SQLite file
+SQLITE_SWEEP_INTERVAL = 60
+
+
+def parse_rate(rate):
+    """ "10/min" -> (capacity 10, refill 10/60 per second)"""
+    num_requests, duration = SimpleRateThrottle.parse_rate(None, rate)
+    return num_requests, num_requests / duration
+
+
+def take(tokens, updated, capacity, per_second, now):
+    """
+    Refill a bucket from updated to now and take one token
+    Returns (tokens left, seconds to wait); wait 0 means allowed
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / per_second
+
+
+class LocalBackend:
+    """Buckets in this process's memory"""
+
+    # consume() never waits on I/O: fine on an event loop
+    blocking = False
+
+    def __init__(self, max_buckets=LOCAL_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        # key -> (tokens, updated, seconds to refill completely)
+        self._buckets = {}
+
+    def consume(self, key, capacity, per_second):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (None, now, 0))
+            tokens, wait = take(tokens, updated, capacity, per_second, now)
+            if len(self._buckets) >= self.max_buckets and key not in self._buckets:
+                self._sweep(now)
+            self._buckets[key] = (tokens, now, (capacity - tokens) / per_second)
+        return wait
+
+    def _sweep(self, now):
+        # A bucket idle long enough to be full again is the same as no bucket
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if now - bucket[1] < bucket[2]
+        }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    """Buckets in a SQLite file shared by the worker processes of one host"""
+
+    # consume() may wait up to a second for the file lock
+    blocking = True
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._swept = 0.0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            # Losing a bucket in a crash only resets a rate limit
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL, updated REAL NOT NULL, full REAL NOT NULL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def consume(self, key, capacity, per_second):
+        try:
+            connection = self._connection()
+            # Wall clock: it has to agree between processes
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT tokens, updated FROM bucket WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row else (None, now)
+                tokens, wait = take(tokens, updated, capacity, per_second, now)
+                connection.execute(
+                    "INSERT OR REPLACE INTO bucket VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (capacity - tokens) / per_second),
+                )
+                if now - self._swept >= SQLITE_SWEEP_INTERVAL:
+                    self._swept = now
+                    connection.execute("DELETE FROM bucket WHERE full <= ?", (now,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            logger.exception("Rate limit store %s unavailable", self.path)
+            return 0.0
+        return wait
+
+    def reset(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM bucket")
+
+
+_lock = threading.Lock()
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _lock:
+        if _backend is None:
+            name = getattr(settings, "RATE_LIMIT_BACKEND", "local")
+            if name == "local":
+                _backend = LocalBackend()
+            elif name == "sqlite":
+                _backend = SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH)
+            else:
+                raise ImproperlyConfigured(f"Unknown RATE_LIMIT_BACKEND {name!r}")
+        return _backend
+
+
+def _rates():
+    return api_settings.DEFAULT_THROTTLE_RATES
+
+
+def consume(scope, ident):
+    """Take a token for ident in scope; returns the seconds to wait (0: go ahead)"""
+    rate = _rates().get(scope)
+    if rate is None:
+        return 0.0
+    capacity, per_second = parse_rate(rate)
+    return get_backend().consume(f"{scope}:{ident}", capacity, per_second)
+
+
+_base = BaseThrottle()
+
+
+def ip_ident(request):
+    return f"ip:{_base.get_ident(request)}"
+
+
+def client_ident(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return ip_ident(request)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Limits views that set throttle_scope to that scope's rate"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None or getattr(request, "skip_throttle", False):
+            return True
+        self.delay = consume(scope, client_ident(request))
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+def throttled_response(wait):
+    seconds = math.ceil(wait)
+    # Same body as DRF's Throttled
+    response = JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {seconds} seconds."},
+        status=429,
+    )
+    response["Retry-After"] = str(seconds)
+    return response
+
+
+def _check(scope, request):
+    if getattr(request, "skip_throttle", False):
+        return 0.0
+    return consume(scope, ip_ident(request))
+
+
+def rate_limit(scope):
+    """
+    Throttle a plain Django view (sync or async) like TokenBucketThrottle
+    Clients are told apart by IP only: reading request.user may need a
+    query, which an async view can't make here
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if get_backend().blocking:
+                    # Connections are per thread: any thread will do
+                    check = sync_to_async(_check, thread_sensitive=False)
+                    wait = await check(scope, request)
+                else:
+                    wait = _check(scope, request)
+                if wait:
+                    return throttled_response(wait)
+                return await view(request, *args, **kwargs)
+
+        else:
+
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                wait = _check(scope, request)
+                if wait:
+                    return throttled_response(wait)
+                return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CultureTourismConfig(AppConfig):
     name = 'culture_tourism'
+
+    def ready(self):
+        # Register signal handlers (catalog version counters)
+        from . import signals  # noqa: F401
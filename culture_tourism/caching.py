@@ -0,0 +1,118 @@
+"""
+HTTP conditional caching for the read-only catalog views
+
+Every catalog model has a CatalogVersion row that is bumped whenever a
+row of that model is saved or deleted (see signals.py). A response's ETag
+is derived from the URL, the negotiated format and the versions of the
+models it depends on, so it can be computed with one small query.
+If-None-Match / If-Modified-Since are answered with a 304 before the
+main query and serializer run.
+
+Last-Modified has one-second resolution: a response built in the same
+second as a write could carry the timestamp of a later write in that
+second too, and If-Modified-Since would then keep the stale copy. So
+Last-Modified is only sent (and If-Modified-Since only honoured) once the
+last write is LAST_MODIFIED_DELAY old; until then the ETag alone
+validates, which is exact.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+from .models import CatalogVersion
+
+LAST_MODIFIED_DELAY = timedelta(seconds=1)
+
+
+def version_name(model):
+    return model._meta.label_lower
+
+
+def bump_version(model):
+    """Record a write to model (called from post_save/post_delete)"""
+    name = version_name(model)
+    rows = CatalogVersion.objects.filter(name=name)
+    bump = {"version": F("version") + 1, "updated_at": timezone.now()}
+    if rows.update(**bump):
+        return
+    # First write to this model: create the row (get_or_create copes with
+    # another process creating it too), then count the write with the same
+    # atomic increment so concurrent first writes aren't lost
+    CatalogVersion.objects.get_or_create(name=name)
+    rows.update(**bump)
+
+
+def get_versions(models):
+    """{name: (version, updated_at)} for models, in one query"""
+    names = [version_name(model) for model in models]
+    rows = CatalogVersion.objects.filter(name__in=names).values_list(
+        "name", "version", "updated_at"
+    )
+    versions = {name: (0, None) for name in names}
+    for name, version, updated_at in rows:
+        versions[name] = (version, updated_at)
+    return versions
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag, Last-Modified and Cache-Control to GET responses and
+    answers conditional requests with 304 Not Modified
+
+    cache_models: models whose writes change this view's output
+    cache_max_age: seconds browsers and shared caches may reuse a response
+    """
+
+    cache_models = ()
+    cache_max_age = 60
+
+    def get_cache_state(self, request):
+        versions = get_versions(self.cache_models)
+        # Kept for views that key their own caches on the same versions
+        self.cache_versions = versions
+
+        key = "|".join(
+            [
+                type(self).__name__,
+                request.get_host(),
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT", ""),
+            ]
+            + [f"{name}:{version}" for name, (version, _) in sorted(versions.items())]
+        )
+        etag = '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+        timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+        last_modified = max(timestamps) if timestamps else None
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_cache_state(request)
+        last_modified_ts = None
+        if last_modified and timezone.now() - last_modified >= LAST_MODIFIED_DELAY:
+            last_modified_ts = int(last_modified.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified_ts
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response["ETag"] = etag
+        if last_modified_ts is not None:
+            response["Last-Modified"] = http_date(last_modified_ts)
+        # Same output for every client: safe for browsers and CDNs to share
+        patch_cache_control(response, public=True, max_age=self.cache_max_age)
+        patch_vary_headers(response, ["Accept"])
+        return response
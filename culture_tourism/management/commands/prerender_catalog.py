@@ -0,0 +1,28 @@
+"""
+Prerender the whole catalog to static JSON (see culture_tourism.prerender)
+
+    python manage.py prerender_catalog [--keep 3]
+"""
+
+from django.core.management.base import BaseCommand
+
+from culture_tourism import prerender
+
+
+class Command(BaseCommand):
+    help = "Render every catalog list/detail response to precompressed JSON files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=3,
+            help="Number of version directories to keep (default: 3)",
+        )
+
+    def handle(self, *args, **options):
+        version, count = prerender.build_all(keep=options["keep"])
+        root = prerender.snapshot_root()
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {count} responses to {root / version}")
+        )
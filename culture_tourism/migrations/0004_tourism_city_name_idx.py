@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('culture_tourism', '0003_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tourism',
+            index=models.Index(fields=['city', 'name', 'id'], name='tourism_city_name_idx'),
+        ),
+    ]
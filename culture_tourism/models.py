@@ -22,6 +22,10 @@ class Tourism(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        # Tourism list: filtered by city, paginated in name order
+        indexes = [models.Index(fields=['city', 'name', 'id'], name='tourism_city_name_idx')]
+
 class TripPlanner(models.Model):
     tourism = models.ForeignKey(Tourism, on_delete=models.CASCADE, related_name='trip_planner', null=True, blank=True)
     id = models.UUIDField(primary_key=True,default=uuid4, editable=False)
@@ -55,3 +59,14 @@ class Food(models.Model):
     def __str__(self):
         return self.name
 
+
+
+class CatalogVersion(models.Model):
+    # One row per catalog model, bumped on every save/delete of that model
+    # Read by the HTTP caching mixin (caching.py) to build ETags cheaply
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
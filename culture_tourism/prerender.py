@@ -0,0 +1,294 @@
+"""
+Prerendered catalog snapshots
+
+Every catalog list and detail response is rendered through the real view
+and written as a static JSON file plus precompressed .gz and .br copies:
+
+    <CATALOG_SNAPSHOT_ROOT>/<version>/<url path>/index.json[.gz|.br]
+    <CATALOG_SNAPSHOT_ROOT>/<version>/<url path>/page/<n>/index.json[...]
+    <CATALOG_SNAPSHOT_ROOT>/current -> <version>
+
+Paginated lists are written page by page (page/<n>/ is ?page=<n>), up to
+their last page.
+
+A full build (manage.py prerender_catalog) writes a new version directory
+and switches the "current" symlink atomically. After that, saving or
+deleting a catalog row re-renders only the files that depend on it (see
+signals.py), in place: once the transaction commits the paths are queued
+and a background thread renders them, so the write's request doesn't
+wait for it.
+
+nginx serves these files directly for GETs without a query string or
+with only ?page=<n>, e.g.:
+
+    location /api/v1/culture_tourism/ {
+        root /path/to/catalog_snapshots;
+        gzip_static on;
+        brotli_static on;          # ngx_brotli
+        default_type application/json;
+        set $snapshot /current$uri/index.json;
+        if ($args ~ "^page=([1-9][0-9]*)$") {
+            set $snapshot /current$uri/page/$1/index.json;
+        }
+        if ($args !~ "^(page=[1-9][0-9]*)?$") {
+            return 418;
+        }
+        error_page 418 = @django;
+        try_files $snapshot @django;
+    }
+
+    location @django {
+        proxy_pass http://django;  # the upstream running the app
+        proxy_set_header Host $host;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+    }
+
+Anything else (?city_id=, ?page_size=, pages past the last one, ...)
+falls through to Django.
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from core.background import BackgroundWorker
+
+from .models import Cities, CultureAndTradition, Food, Tourism, TripPlanner
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz files are written without it
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+CURRENT = "current"
+
+# url name of the list view, url name of the detail view, model
+CATALOG = [
+    ("cities-list", "city-bundle", Cities),
+    ("tourism-list", "tourism-detail", Tourism),
+    ("culture-list", "culture-detail", CultureAndTradition),
+    ("food-list", "food-detail", Food),
+    ("trip-planner-list", "trip-planner-detail", TripPlanner),
+]
+
+
+def snapshot_root():
+    return Path(settings.CATALOG_SNAPSHOT_ROOT)
+
+
+def all_paths():
+    """URL path of every catalog response"""
+    for list_name, detail_name, model in CATALOG:
+        yield reverse(list_name)
+        for pk in model.objects.values_list("pk", flat=True).iterator():
+            yield reverse(detail_name, kwargs={"pk": pk})
+
+
+def paths_for(instance):
+    """URL paths whose content depends on one catalog row"""
+    pk = instance.pk
+    if isinstance(instance, Cities):
+        paths = [reverse("cities-list"), reverse("city-bundle", kwargs={"pk": pk})]
+        # city_name on the tourism detail pages
+        for tourism_id in Tourism.objects.filter(city_id=pk).values_list(
+            "pk", flat=True
+        ):
+            paths.append(reverse("tourism-detail", kwargs={"pk": tourism_id}))
+        return paths
+    if isinstance(instance, Tourism):
+        return [
+            reverse("tourism-list"),
+            reverse("tourism-detail", kwargs={"pk": pk}),
+            reverse("city-bundle", kwargs={"pk": instance.city_id}),
+        ]
+    if isinstance(instance, TripPlanner):
+        paths = [
+            reverse("trip-planner-list"),
+            reverse("trip-planner-detail", kwargs={"pk": pk}),
+        ]
+        if instance.tourism_id:
+            paths.append(reverse("tourism-detail", kwargs={"pk": instance.tourism_id}))
+            city_id = (
+                Tourism.objects.filter(pk=instance.tourism_id)
+                .values_list("city_id", flat=True)
+                .first()
+            )
+            if city_id:
+                paths.append(reverse("city-bundle", kwargs={"pk": city_id}))
+        return paths
+    if isinstance(instance, CultureAndTradition):
+        return [reverse("culture-list"), reverse("culture-detail", kwargs={"pk": pk})]
+    if isinstance(instance, Food):
+        return [reverse("food-list"), reverse("food-detail", kwargs={"pk": pk})]
+    return []
+
+
+def render(path, query=None):
+    """(status code, body bytes) of a GET to path through the real view"""
+    factory = RequestFactory(
+        HTTP_HOST=settings.CATALOG_SNAPSHOT_HOST, HTTP_ACCEPT="application/json"
+    )
+    request = factory.get(path, query, secure=settings.CATALOG_SNAPSHOT_SECURE)
+    # Not a client: don't spend the catalog rate limit (core/throttling.py)
+    request.skip_throttle = True
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    if response.streaming:
+        body = b"".join(response.streaming_content)
+    else:
+        body = response.content
+    return response.status_code, body
+
+
+def _write_atomic(target, data):
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, target)
+
+
+def _write_files(folder, body):
+    folder.mkdir(parents=True, exist_ok=True)
+    _write_atomic(folder / "index.json", body)
+    _write_atomic(folder / "index.json.gz", gzip.compress(body, 9, mtime=0))
+    if brotli is not None:
+        _write_atomic(folder / "index.json.br", brotli.compress(body))
+
+
+def _has_next(body):
+    # Paginated lists (core.pagination.PagePagination) link the next page
+    data = json.loads(body)
+    return isinstance(data, dict) and data.get("next") is not None
+
+
+def write_path(directory, path):
+    """
+    Render path into directory (every page of a paginated list); remove
+    its files if it no longer exists. Returns the number of responses written
+    """
+    folder = directory / path.strip("/")
+    pages = folder / "page"
+    status, body = render(path)
+
+    if status == 404:
+        shutil.rmtree(folder, ignore_errors=True)
+        return 0
+    if status != 200:
+        raise RuntimeError(f"Prerendering {path} returned HTTP {status}")
+
+    _write_files(folder, body)
+    written = 1
+    if _has_next(body) or pages.exists():
+        # ?page=1 is the same response
+        _write_files(pages / "1", body)
+        number = 1
+        while _has_next(body):
+            number += 1
+            status, body = render(path, {"page": number})
+            if status != 200:
+                raise RuntimeError(
+                    f"Prerendering {path}?page={number} returned HTTP {status}"
+                )
+            _write_files(pages / str(number), body)
+            written += 1
+        # Pages past the new last one, once the list got shorter
+        for old in pages.iterdir():
+            if not old.name.isdigit() or int(old.name) > number:
+                shutil.rmtree(old, ignore_errors=True)
+    return written
+
+
+def new_version():
+    # Sorts in build order; the suffix keeps two builds in the same
+    # microsecond (or on two hosts sharing the directory) apart
+    now = time.time()
+    stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime(now))
+    return f"v{stamp}{int(now % 1 * 1_000_000):06d}-{uuid.uuid4().hex[:8]}"
+
+
+def build_all(keep=3):
+    """Full build into a new version directory, then switch "current" to it"""
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+    version = new_version()
+    directory = root / version
+    directory.mkdir()
+
+    count = sum(write_path(directory, path) for path in all_paths())
+
+    link = root / f".{CURRENT}.{os.getpid()}.tmp"
+    if link.is_symlink():
+        link.unlink()
+    link.symlink_to(version)
+    os.replace(link, root / CURRENT)
+
+    # Drop old versions (nginx may still be reading the previous one)
+    versions = sorted(
+        p for p in root.iterdir() if p.is_dir() and p.name.startswith("v")
+    )
+    for old in versions[: -keep or None]:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return version, count
+
+
+def refresh(paths):
+    """Re-render some paths inside the current version (incremental update)"""
+    current = snapshot_root() / CURRENT
+    if not current.exists():
+        # Nothing built yet: wait for the first full build
+        return
+    directory = current.resolve()
+    for path in dict.fromkeys(paths):
+        try:
+            write_path(directory, path)
+        except Exception:
+            logger.exception("Could not prerender %s", path)
+
+
+class RefreshQueue(BackgroundWorker):
+    """
+    Paths waiting for refresh(), rendered by a background thread
+
+    A path queued again before it is rendered is rendered once.
+    """
+
+    thread_name = "catalog-prerender"
+    failure_message = "Catalog prerender failed"
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def add(self, paths):
+        self.start()
+        with self._lock:
+            self._paths.update(dict.fromkeys(paths))
+        self.wake()
+
+    def flush(self):
+        """Render every queued path now; returns how many there were"""
+        with self._lock:
+            paths, self._paths = list(self._paths), {}
+        if paths:
+            refresh(paths)
+        return len(paths)
+
+
+refreshes = RefreshQueue()
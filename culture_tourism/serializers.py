@@ -1,35 +1,66 @@
 from rest_framework import serializers
 from .models import Cities, Tourism, TripPlanner, CultureAndTradition, Food
+from core.serializers import ImageVariantsField
+from core.sparse import SparseFieldsetMixin
+
+class TripPlannerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    banner_variants = ImageVariantsField(source='banner')
 
-class TripPlannerSerializer(serializers.ModelSerializer):
     class Meta:
         model = TripPlanner
         fields = '__all__'
 
-class CitiesSerializer(serializers.ModelSerializer):
+class CitiesSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    thumbnail_variants = ImageVariantsField(source='thumbnail')
+
     class Meta:
         model = Cities
         fields = '__all__'
 
 class TourismListSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Tourism
-        fields = ['id', 'name', 'image', 'city']
+        fields = ['id', 'name', 'image', 'image_variants', 'city']
 
 class TourismDetailSerializer(serializers.ModelSerializer):
     trip_planner = TripPlannerSerializer(many=True, read_only=True)
     city_name = serializers.CharField(source='city.name', read_only=True)
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = Tourism
-        fields = ['id', 'name', 'image', 'about', 'history', 'location', 'city', 'city_name', 'trip_planner']
+        fields = ['id', 'name', 'image', 'image_variants', 'about', 'history', 'location', 'city', 'city_name', 'trip_planner']
+
+class CultureAndTraditionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
 
-class CultureAndTraditionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CultureAndTradition
         fields = '__all__'
 
-class FoodSerializer(serializers.ModelSerializer):
+class FoodSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Food
         fields = '__all__'
+
+class TourismBundleSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+    trip_planner = TripPlannerSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Tourism
+        fields = ['id', 'name', 'image', 'image_variants', 'city', 'trip_planner']
+
+class CityBundleSerializer(serializers.ModelSerializer):
+    # City + its tourism spots + their trip planners, for the home screen
+    # (no sparse fieldsets: the view caches one snapshot per city)
+    thumbnail_variants = ImageVariantsField(source='thumbnail')
+    tourism = TourismBundleSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Cities
+        fields = '__all__'
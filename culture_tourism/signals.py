@@ -0,0 +1,63 @@
+"""
+Signal handlers for culture_tourism models
+Connected in CultureTourismConfig.ready()
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from core import images
+
+from . import prerender
+from .caching import bump_version
+from .models import Cities, CultureAndTradition, Food, Tourism, TripPlanner
+
+CATALOG_MODELS = [Cities, Tourism, TripPlanner, CultureAndTradition, Food]
+
+
+def catalog_changed(sender, instance, **kwargs):
+    # Any write invalidates cached responses built from this model
+    bump_version(sender)
+
+    if settings.CATALOG_SNAPSHOTS_ENABLED:
+        # Work out the affected files now (the row may be gone later),
+        # render them in the background once the data is committed
+        paths = prerender.paths_for(instance)
+        transaction.on_commit(lambda: prerender.refreshes.add(paths))
+
+
+def image_built(model, name):
+    # Catalog rows showing that image (none for an image replaced since)
+    fields = [
+        field for label, field in images.IMAGE_FIELDS if label == model._meta.label
+    ]
+    for field_name in fields:
+        for instance in model.objects.filter(**{field_name: name}):
+            catalog_changed(model, instance)
+
+
+def derivatives_built(sender, name, **kwargs):
+    # Responses built before now show the image without variants: count a
+    # write so ETags, bundle snapshots and prerendered files are renewed
+    image_built(sender, name)
+
+    # Other processes may still believe "not built" for images.MISSING_TTL
+    # and cache that under the new version: renew once more after it
+    def again():
+        try:
+            image_built(sender, name)
+        finally:
+            close_old_connections()
+
+    timer = threading.Timer(images.MISSING_TTL + 1, again)
+    timer.daemon = True
+    timer.start()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
+    images.derivatives_built.connect(derivatives_built, sender=model)
@@ -1,3 +1,264 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import images
+
+from . import caching, prerender
+from .models import CatalogVersion, Cities, Tourism, TripPlanner
+
+
+def create_tourism(city, index, planners=2):
+    tourism = Tourism.objects.create(
+        city=city,
+        name=f"{city.name} spot {index}",
+        image="",
+        about="About " * 200,
+        location="Location",
+    )
+    for number in range(planners):
+        TripPlanner.objects.create(
+            tourism=tourism,
+            name=f"Planner {number}",
+            contact_person_name="Guide",
+            mobile="9800000000",
+        )
+    return tourism
+
+
+class TourismQueryCountTests(TestCase):
+    """
+    Pin the tourism endpoints to a fixed number of queries so an N+1
+    (per-row city or trip planner lookup) shows up as a failing test
+
+    Every request also reads the catalog versions once (ETag, caching.py)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = Cities.objects.create(name="Pokhara")
+        cls.other_city = Cities.objects.create(name="Chitwan")
+        for city in (cls.city, cls.other_city):
+            for index in range(5):
+                create_tourism(city, index)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_query_count(self):
+        # versions + page + count
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("tourism-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 10)
+        self.assertNotIn("about", response.data["data"][0])
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        for index in range(5, 25):
+            create_tourism(self.city, index)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("tourism-list"), {"page_size": 50})
+        self.assertEqual(len(response.data["data"]), 30)
+
+    def test_list_filtered_by_city_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("tourism-list"), {"city_id": str(self.city.id)}
+            )
+        self.assertEqual(response.data["count"], 5)
+        self.assertTrue(
+            all(item["city"] == self.city.id for item in response.data["data"])
+        )
+
+    def test_list_rejects_invalid_city_id(self):
+        response = self.client.get(reverse("tourism-list"), {"city_id": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_query_count(self):
+        tourism = create_tourism(self.city, 99, planners=6)
+        # versions + tourism joined with city + trip planners
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("tourism-detail", kwargs={"pk": tourism.pk})
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["city_name"], "Pokhara")
+        self.assertEqual(len(response.data["trip_planner"]), 6)
+
+    def test_not_modified_query_count(self):
+        response = self.client.get(reverse("tourism-list"))
+        # Only the versions are read before answering 304
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("tourism-list"), HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+class CityBundleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = Cities.objects.create(name="Pokhara")
+        for index in range(3):
+            create_tourism(cls.city, index, planners=3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("city-bundle", kwargs={"pk": self.city.pk})
+
+    def test_bundle_query_count(self):
+        # versions + city + tourism + trip planners
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["tourism"]), 3)
+        self.assertEqual(len(response.data["tourism"][0]["trip_planner"]), 3)
+
+    def test_bundle_snapshot_is_rebuilt_after_a_write(self):
+        self.client.get(self.url)
+        # Snapshot served from cache: only the versions are read
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        create_tourism(self.city, 10, planners=1)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data["tourism"]), 4)
+
+
+class DerivativesBuiltTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        images._manifests.clear()
+        timer = mock.patch('culture_tourism.signals.threading.Timer')
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 24), 'green').save(buffer, 'PNG')
+        self.name = default_storage.save('test/city.png', ContentFile(buffer.getvalue()))
+        # Saved without running the on-commit build
+        with self.captureOnCommitCallbacks():
+            self.city = Cities.objects.create(name='Pokhara', thumbnail=self.name)
+        self.client = APIClient()
+        self.url = reverse('city-bundle', kwargs={'pk': self.city.pk})
+
+    def version(self):
+        return CatalogVersion.objects.get(name='culture_tourism.cities').version
+
+    def test_cached_responses_are_renewed(self):
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data['thumbnail_variants'])
+        version = self.version()
+
+        images.build_for_name(self.name, sender=Cities)
+        self.assertEqual(self.version(), version + 1)
+        response_after = self.client.get(self.url)
+        self.assertNotEqual(response_after['ETag'], response['ETag'])
+        # Neither the bundle snapshot nor the "not built" answer is reused
+        self.assertIsNotNone(response_after.data['thumbnail_variants'])
+
+        # Renewed again once other processes' answers have expired
+        delay, again = self.timer.call_args.args
+        self.assertGreater(delay, images.MISSING_TTL)
+        again()
+        self.assertEqual(self.version(), version + 2)
+
+    def test_unrelated_images_change_nothing(self):
+        version = self.version()
+        images.derivatives_built.send(sender=Cities, name='test/other.png', manifest={})
+        self.assertEqual(self.version(), version)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_first_writes_are_all_counted(self):
+        CatalogVersion.objects.all().delete()
+        caching.bump_version(Cities)
+        caching.bump_version(Cities)
+        version = CatalogVersion.objects.get(name='culture_tourism.cities')
+        self.assertEqual(version.version, 2)
+
+    def test_last_modified_waits_for_the_second_to_pass(self):
+        Cities.objects.create(name='Pokhara')
+        response = self.client.get(reverse('cities-list'))
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('ETag', response)
+
+        later = timezone.now() + timedelta(seconds=2)
+        with mock.patch('culture_tourism.caching.timezone.now', return_value=later):
+            response = self.client.get(reverse('cities-list'))
+            self.assertIn('Last-Modified', response)
+            response = self.client.get(
+                reverse('cities-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+class PrerenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = Cities.objects.create(name='Pokhara')
+        for index in range(45):
+            create_tourism(cls.city, index, planners=0)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(
+            CATALOG_SNAPSHOT_ROOT=root, CATALOG_SNAPSHOTS_ENABLED=True
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = Path(root)
+
+    def read(self, path):
+        return json.loads((self.root / 'current' / path / 'index.json').read_bytes())
+
+    def test_every_page_is_written(self):
+        prerender.build_all()
+        pages = self.root / 'current/api/v1/culture_tourism/tourism/page'
+        self.assertEqual(sorted(p.name for p in pages.iterdir()), ['1', '2', '3'])
+        last = self.read('api/v1/culture_tourism/tourism/page/3')
+        self.assertEqual(len(last['data']), 5)
+        self.assertIsNone(last['next'])
+
+    def test_builds_in_the_same_second(self):
+        with mock.patch('time.time', return_value=1_700_000_000.0):
+            first, _ = prerender.build_all()
+            second, _ = prerender.build_all()
+        self.assertNotEqual(first, second)
+        self.assertEqual((self.root / 'current').resolve().name, second)
+
+    def test_writes_are_rendered_in_the_background(self):
+        prerender.build_all()
+        with mock.patch.object(prerender.refreshes, 'start'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Tourism.objects.filter(name__regex=r' 4[0-4]$').delete()
+            # Queued, not rendered yet
+            self.assertEqual(self.read('api/v1/culture_tourism/tourism')['count'], 45)
+            prerender.refreshes.flush()
+        self.assertEqual(self.read('api/v1/culture_tourism/tourism')['count'], 40)
+        # The list got shorter: its last page is gone
+        pages = self.root / 'current/api/v1/culture_tourism/tourism/page'
+        self.assertEqual(sorted(p.name for p in pages.iterdir()), ['1', '2'])
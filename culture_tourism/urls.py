@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     CitiesListAPIView,
+    CityBundleAPIView,
     TourismListAPIView,
     TourismDetailAPIView,
     CultureAndTraditionListAPIView,
@@ -13,6 +14,7 @@ from .views import (
 
 urlpatterns = [
     path('cities/', CitiesListAPIView.as_view(), name='cities-list'),
+    path('cities/<uuid:pk>/bundle/', CityBundleAPIView.as_view(), name='city-bundle'),
     path('tourism/', TourismListAPIView.as_view(), name='tourism-list'),
     path('tourism/<uuid:pk>/', TourismDetailAPIView.as_view(), name='tourism-detail'),
     path('culture/', CultureAndTraditionListAPIView.as_view(), name='culture-list'),
@@ -1,7 +1,18 @@
-from rest_framework import generics, permissions
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
+from core.fastpath import CompiledListMixin
+from core.pagination import PagePagination
+from core.sparse import SparseQuerysetMixin
+from core.streaming import StreamingListMixin
 from .models import Cities, Tourism, CultureAndTradition, Food, TripPlanner
+from .caching import ConditionalGetMixin
 from .serializers import (
     CitiesSerializer, 
+    CityBundleSerializer,
     TourismListSerializer, 
     TourismDetailSerializer,
     CultureAndTraditionSerializer,
@@ -9,50 +20,117 @@ from .serializers import (
     TripPlannerSerializer
 )
 
-class CitiesListAPIView(generics.ListAPIView):
+class CitiesListAPIView(ConditionalGetMixin, StreamingListMixin, CompiledListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    cache_models = [Cities]
     queryset = Cities.objects.all()
     serializer_class = CitiesSerializer
+    compiled_serializer = True
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
+
+class CityBundleAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    City, its tourism spots and their trip planners in one response
+
+    Built with 3 queries (city, tourism, trip planners) and stored in the
+    Django cache keyed by the catalog versions, so any write to those
+    models makes the next request rebuild the snapshot.
+    """
+    cache_models = [Cities, Tourism, TripPlanner]
+    serializer_class = CityBundleSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
+    snapshot_timeout = 60 * 60 * 24
+
+    def get_queryset(self):
+        tourism = (
+            Tourism.objects.defer('about', 'history', 'location')
+            .order_by('name', 'id')
+            .prefetch_related('trip_planner')
+        )
+        return Cities.objects.prefetch_related(Prefetch('tourism', queryset=tourism))
+
+    def get_snapshot_key(self):
+        versions = ",".join(
+            f"{name}:{version}" for name, (version, _) in sorted(self.cache_versions.items())
+        )
+        # Image URLs are absolute, so the host is part of the key
+        base_url = self.request.build_absolute_uri('/')
+        return f"culture_tourism:bundle:{self.kwargs['pk']}:{base_url}:{versions}"
+
+    def retrieve(self, request, *args, **kwargs):
+        key = self.get_snapshot_key()
+        data = cache.get(key)
+        if data is None:
+            serializer = self.get_serializer(self.get_object())
+            data = serializer.data
+            cache.set(key, data, self.snapshot_timeout)
+        return Response(data)
 
-class TourismListAPIView(generics.ListAPIView):
+class TourismListAPIView(ConditionalGetMixin, CompiledListMixin, generics.ListAPIView):
+    cache_models = [Tourism]
     serializer_class = TourismListSerializer
+    compiled_serializer = True
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
+    pagination_class = PagePagination
 
     def get_queryset(self):
-        queryset = Tourism.objects.all()
+        # The list only shows id/name/image/city: skip the large text columns
+        queryset = Tourism.objects.defer('about', 'history', 'location').order_by('name', 'id')
         city_id = self.request.query_params.get('city_id')
         if city_id:
+            try:
+                city_id = UUID(city_id)
+            except ValueError:
+                raise serializers.ValidationError({'city_id': ['Must be a valid UUID.']})
             queryset = queryset.filter(city_id=city_id)
         return queryset
 
-class TourismDetailAPIView(generics.RetrieveAPIView):
-    queryset = Tourism.objects.all()
+class TourismDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    cache_models = [Tourism, Cities, TripPlanner]
+    # city_name and trip_planner come with the tourism row: 2 queries total
+    queryset = Tourism.objects.select_related('city').prefetch_related('trip_planner')
     serializer_class = TourismDetailSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
-class CultureAndTraditionListAPIView(generics.ListAPIView):
+class CultureAndTraditionListAPIView(ConditionalGetMixin, StreamingListMixin, CompiledListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    cache_models = [CultureAndTradition]
     queryset = CultureAndTradition.objects.all()
     serializer_class = CultureAndTraditionSerializer
+    compiled_serializer = True
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
-class CultureAndTraditionDetailAPIView(generics.RetrieveAPIView):
+class CultureAndTraditionDetailAPIView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveAPIView):
+    cache_models = [CultureAndTradition]
     queryset = CultureAndTradition.objects.all()
     serializer_class = CultureAndTraditionSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
-class FoodListAPIView(generics.ListAPIView):
+class FoodListAPIView(ConditionalGetMixin, StreamingListMixin, CompiledListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    cache_models = [Food]
     queryset = Food.objects.all()
     serializer_class = FoodSerializer
+    compiled_serializer = True
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
-class FoodDetailAPIView(generics.RetrieveAPIView):
+class FoodDetailAPIView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveAPIView):
+    cache_models = [Food]
     queryset = Food.objects.all()
     serializer_class = FoodSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
-class TripPlannerListAPIView(generics.ListAPIView):
+class TripPlannerListAPIView(ConditionalGetMixin, StreamingListMixin, CompiledListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    cache_models = [TripPlanner]
     serializer_class = TripPlannerSerializer
+    compiled_serializer = True
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
 
     def get_queryset(self):
         queryset = TripPlanner.objects.all()
@@ -61,7 +139,9 @@ class TripPlannerListAPIView(generics.ListAPIView):
             queryset = queryset.filter(tourism_id=tourism_id)
         return queryset
 
-class TripPlannerDetailAPIView(generics.RetrieveAPIView):
+class TripPlannerDetailAPIView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveAPIView):
+    cache_models = [TripPlanner]
     queryset = TripPlanner.objects.all()
     serializer_class = TripPlannerSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalog'
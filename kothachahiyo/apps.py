@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class KothachahiyoConfig(AppConfig):
     name = "kothachahiyo"
+
+    def ready(self):
+        # Register signal handlers (full-text index, lookup cache)
+        from . import signals  # noqa: F401
@@ -0,0 +1,117 @@
+"""
+Room filtering - turns query parameters into an indexed Room queryset
+
+Supported parameters:
+- min_price / max_price: inclusive price range
+- district: District id
+- city: City id
+- furnished: one of Room.FURNISHED_CHOICE values
+- q: full-text search over title, content and address (see search.py)
+- sort: "newest", "price", "-price" or "relevance"
+  (default: "relevance" when q is given, otherwise "newest")
+
+Indexes (Room.Meta):
+- district, city or furnished with a price range and/or a price sort:
+  one range of that filter's (<filter>, price, id) index
+- district or city with the default "newest" sort: (<filter>, id)
+- price range or sort alone: (price, id); no filter, newest: the primary key
+- several filters at once (e.g. district and city): the index of one of
+  them (the database picks, normally city: a city lies in one district),
+  the other conditions are checked on the rows it returns
+- furnished with "newest" has no index of its own: furnished matches a
+  large share of the rooms, so the primary key order is read and filtered
+- q: the full-text index (search.py), other filters checked on its matches
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from rest_framework import serializers
+
+from .models import Room
+from .search import search_rooms
+
+# sort value -> ORDER BY; "id" is always last so the order is total
+ROOM_SORTS = {
+    "newest": ("-id",),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "relevance": ("-search_rank", "-id"),
+}
+
+
+def _parse_price(params, name, errors):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        errors[name] = ["A valid number is required."]
+        return None
+    # "nan" and "inf" parse, but are no price (and NaN can't be compared)
+    if not price.is_finite():
+        errors[name] = ["A valid number is required."]
+        return None
+    if price < 0:
+        errors[name] = ["Price cannot be negative."]
+        return None
+    return price
+
+
+def _parse_id(params, name, errors):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        errors[name] = ["A valid integer is required."]
+        return None
+
+
+def filter_rooms(queryset, params):
+    """
+    Apply the room filters found in params (request.query_params) to queryset
+    Raises serializers.ValidationError (HTTP 400) for malformed values
+    """
+    errors = {}
+
+    min_price = _parse_price(params, "min_price", errors)
+    max_price = _parse_price(params, "max_price", errors)
+    district = _parse_id(params, "district", errors)
+    city = _parse_id(params, "city", errors)
+
+    furnished = params.get("furnished") or None
+    if furnished and furnished not in dict(Room.FURNISHED_CHOICE):
+        errors["furnished"] = [
+            "Must be one of: %s." % ", ".join(dict(Room.FURNISHED_CHOICE))
+        ]
+
+    query = (params.get("q") or "").strip()
+
+    sort = params.get("sort") or ("relevance" if query else "newest")
+    if sort not in ROOM_SORTS:
+        errors["sort"] = ["Must be one of: %s." % ", ".join(ROOM_SORTS)]
+    elif sort == "relevance" and not query:
+        errors["sort"] = ["Sorting by relevance requires q."]
+
+    if min_price is not None and max_price is not None and min_price > max_price:
+        errors["min_price"] = ["min_price cannot be greater than max_price."]
+
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    if district is not None:
+        queryset = queryset.filter(district_id=district)
+    if city is not None:
+        queryset = queryset.filter(city_id=city)
+    if furnished:
+        queryset = queryset.filter(is_furnished=furnished)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if query:
+        queryset = search_rooms(queryset, query)
+
+    return queryset.order_by(*ROOM_SORTS[sort])
@@ -0,0 +1,79 @@
+"""
+In-process cache of districts and their cities
+
+Districts and cities almost never change, so they are loaded once per
+process into an immutable snapshot together with a strong ETag for every
+payload. The snapshot is dropped by the District/City save/delete signals
+once the write commits (see signals.py): dropped any earlier, a request
+could rebuild it from the data as it was before the commit. A snapshot
+whose build started before an invalidate() is returned but not kept. It
+also expires after CACHE_TTL seconds, which bounds how long another
+worker process can serve data changed elsewhere.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from .models import City, District
+
+CACHE_TTL = 300
+
+_lock = threading.Lock()
+_snapshot = None
+# Bumped by invalidate(), so a build racing with it isn't kept
+_generation = 0
+
+
+def _etag(data):
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+
+
+class LookupSnapshot:
+    """Districts, cities grouped by district id, and their ETags"""
+
+    def __init__(self, districts, cities):
+        self.expires = time.monotonic() + CACHE_TTL
+        self.districts = districts
+        self.districts_etag = _etag(districts)
+
+        self.cities = {district["id"]: [] for district in districts}
+        for city in cities:
+            self.cities.setdefault(city["district"], []).append(city)
+        self.cities_etags = {
+            district_id: _etag(items) for district_id, items in self.cities.items()
+        }
+
+
+def _build():
+    # Imported here: serializers import models, keep this module light
+    from .serializers import CitySerializer, DistrictSerializer
+
+    districts = DistrictSerializer(District.objects.order_by("id"), many=True).data
+    cities = CitySerializer(City.objects.order_by("name"), many=True).data
+    return LookupSnapshot(
+        [dict(district) for district in districts], [dict(city) for city in cities]
+    )
+
+
+def get_snapshot():
+    """Current snapshot, rebuilt (two queries) when missing or expired"""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or snapshot.expires <= time.monotonic():
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.expires <= time.monotonic():
+                generation = _generation
+                snapshot = _build()
+                if generation == _generation:
+                    _snapshot = snapshot
+    return snapshot
+
+
+def invalidate():
+    global _snapshot, _generation
+    _generation += 1
+    _snapshot = None
@@ -0,0 +1,74 @@
+# Full-text search index for Room (title, content, address)
+# PostgreSQL: generated tsvector column + GIN index
+# SQLite: FTS5 virtual table, filled here and kept in sync by signals.py
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE kothachahiyo_room ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(address, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX room_search_vector_idx ON kothachahiyo_room USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS room_search_vector_idx",
+    "ALTER TABLE kothachahiyo_room DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE kothachahiyo_room_fts USING fts5(
+        title, content, address, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO kothachahiyo_room_fts (rowid, title, content, address)
+    SELECT id, title, content, coalesce(address, '') FROM kothachahiyo_room
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TABLE IF EXISTS kothachahiyo_room_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    elif vendor == "sqlite":
+        statements = SQLITE_FORWARD
+    else:
+        # Other databases fall back to icontains matching (see search.py)
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_REVERSE
+    elif vendor == "sqlite":
+        statements = SQLITE_REVERSE
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("kothachahiyo", "0003_room_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -52,6 +52,24 @@ class Room(models.Model):
     def __str__(self):
         return self.title
 
+    class Meta:
+        # Composite indexes backing the room list filters (see filters.py)
+        # Each one ends with (price, id) so a price range and a price sort
+        # are answered from the same index range
+        indexes = [
+            models.Index(
+                fields=["district", "price", "id"], name="room_district_price_idx"
+            ),
+            models.Index(fields=["city", "price", "id"], name="room_city_price_idx"),
+            models.Index(
+                fields=["is_furnished", "price", "id"], name="room_furnished_price_idx"
+            ),
+            models.Index(fields=["price", "id"], name="room_price_idx"),
+            # Default "newest" sort (ORDER BY id DESC) within a district/city
+            models.Index(fields=["district", "id"], name="room_district_id_idx"),
+            models.Index(fields=["city", "id"], name="room_city_id_idx"),
+        ]
+
 
 class RoomImage(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="room_images")
@@ -0,0 +1,116 @@
+"""
+Room full-text search over title, content and address
+
+Backends (picked from the database vendor):
+- PostgreSQL: generated tsvector column "search_vector" with a GIN index,
+  kept up to date by the database itself
+- SQLite: FTS5 virtual table "kothachahiyo_room_fts" (rowid = room id),
+  kept up to date by the post_save/post_delete handlers in signals.py
+- anything else: plain icontains matching without ranking
+
+The tables/columns are created by migration 0004_room_search_index.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "kothachahiyo_room_fts"
+
+# At most this many words of the query are used
+MAX_TERMS = 8
+
+# Column weights for bm25 (title, content, address)
+SQLITE_WEIGHTS = "10.0, 1.0, 4.0"
+
+_fts_ready = None
+
+
+def _terms(query):
+    return re.findall(r"\w+", query or "")[:MAX_TERMS]
+
+
+def sqlite_fts_ready():
+    """True when running on SQLite and the FTS5 table exists"""
+    global _fts_ready
+    if connection.vendor != "sqlite":
+        return False
+    if _fts_ready is None:
+        _fts_ready = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready
+
+
+def index_room(room):
+    """Insert or replace one room in the SQLite FTS table"""
+    if not sqlite_fts_ready():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [room.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content, address) "
+            "VALUES (%s, %s, %s, %s)",
+            [room.pk, room.title, room.content, room.address or ""],
+        )
+
+
+def unindex_room(room_id):
+    """Remove one room from the SQLite FTS table"""
+    if not sqlite_fts_ready():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [room_id])
+
+
+def search_rooms(queryset, query):
+    """
+    Restrict queryset to rooms matching query and annotate "search_rank"
+    (higher is more relevant). Every word must match, as a prefix.
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0)).none()
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return queryset.filter(
+            RawSQL(
+                "kothachahiyo_room.search_vector @@ to_tsquery('simple', %s)",
+                (tsquery,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                "ts_rank_cd(kothachahiyo_room.search_vector, "
+                "to_tsquery('simple', %s))",
+                (tsquery,),
+                output_field=FloatField(),
+            )
+        )
+
+    if sqlite_fts_ready():
+        match = " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                (match,),
+            )
+        ).annotate(
+            # bm25() is lower-is-better, negate it so both backends agree
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, {SQLITE_WEIGHTS}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = kothachahiyo_room.id",
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term)
+            | Q(content__icontains=term)
+            | Q(address__icontains=term)
+        )
+    return queryset.filter(condition).annotate(search_rank=Value(0.0))
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Room, RoomImage, District
+from .models import Room, RoomImage, District, City
+from core.serializers import ImageVariantsField
+from core.sparse import SparseFieldsetMixin
 
 
 
@@ -10,14 +12,22 @@ class DistrictSerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
+class CitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = City
+        fields = ["id", "name", "district"]
+
+
 
 class RoomImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source="image")
+
     class Meta:
         model = RoomImage
-        fields = ["id", "image"]
+        fields = ["id", "image", "image_variants"]
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     room_images = RoomImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -0,0 +1,33 @@
+"""
+Signal handlers for kothachahiyo models
+Connected in KothachahiyoConfig.ready()
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import lookups
+from .models import City, District, Room
+from .search import index_room, unindex_room
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, **kwargs):
+    # Keep the full-text index in step with the row (no-op on PostgreSQL)
+    index_room(instance)
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    unindex_room(instance.pk)
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def lookups_changed(sender, **kwargs):
+    # Districts/cities changed, the cached lookup snapshot is stale once
+    # the write is visible to other connections
+    transaction.on_commit(lookups.invalidate)
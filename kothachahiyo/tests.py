@@ -1,3 +1,353 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.images import has_derivatives
+
+from . import lookups
+from .models import City, District, Room, RoomImage
+from .uploads import save_room_images
+
+
+class RoomFilterTests(TestCase):
+    """Room list filters (filters.py): bad values are a 400, never a 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("asha", password="pw-12345")
+        cls.district = District.objects.create(name="Kaski")
+        cls.city = City.objects.create(district=cls.district, name="Pokhara")
+        furnished = Room.FURNISHED_CHOICE[0][0]
+        for index, price in enumerate((5000, 8000, 12000)):
+            Room.objects.create(
+                user=cls.user,
+                title=f"Room {index}",
+                content="Quiet room",
+                is_furnished=furnished,
+                price=Decimal(price),
+                district=cls.district if index else None,
+                city=cls.city if index else None,
+                mobile_number="9800000000",
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rooms(self, **params):
+        return self.client.get(reverse("room_data"), params)
+
+    def prices(self, **params):
+        response = self.rooms(**params)
+        self.assertEqual(response.status_code, 200)
+        return [Decimal(str(room["price"])) for room in response.data["data"]]
+
+    def test_price_range_and_sort(self):
+        self.assertEqual(
+            self.prices(min_price="6000", max_price="12000", sort="price"),
+            [Decimal(8000), Decimal(12000)],
+        )
+
+    def test_district_and_city(self):
+        self.assertEqual(len(self.prices(district=self.district.pk)), 2)
+        self.assertEqual(
+            len(self.prices(district=self.district.pk, city=self.city.pk)), 2
+        )
+
+    def test_invalid_values(self):
+        for params in (
+            {"min_price": "nan"},
+            {"max_price": "NaN"},
+            {"min_price": "sNaN"},
+            {"min_price": "Infinity"},
+            {"max_price": "-inf"},
+            {"min_price": "cheap"},
+            {"min_price": "-1"},
+            {"min_price": "10", "max_price": "5"},
+            {"district": "one"},
+            {"furnished": "maybe"},
+            {"sort": "relevance"},
+        ):
+            with self.subTest(params):
+                self.assertEqual(self.rooms(**params).status_code, 400)
+
+    def test_same_output_without_compiling(self):
+        for params in ({}, {"stream": "true"}):
+            with self.subTest(params):
+                compiled = self.rooms(**params)
+                with override_settings(COMPILED_SERIALIZERS=False):
+                    plain = self.rooms(**params)
+                self.assertEqual(self.body(plain), self.body(compiled))
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return response.json()
+
+
+class RoomListQueryTests(TestCase):
+    """The room list costs the same queries whatever the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("asha", password="pw-12345")
+        for index in range(12):
+            room = Room.objects.create(
+                user=user,
+                title=f"Room {index}",
+                content="Quiet room",
+                is_furnished=Room.FURNISHED_CHOICE[0][0],
+                price=Decimal(5000 + index),
+                mobile_number="9800000000",
+            )
+            RoomImage.objects.bulk_create(
+                RoomImage(room=room, image=f"room/images/{index}-{n}.png")
+                for n in range(2)
+            )
+        cls.user = user
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        # (params, queries): rooms + their images, plus COUNT(*) for ?page=
+        cases = [({}, 2), ({"page": 1}, 3), ({"page": 1, "count": "false"}, 2)]
+        for params, queries in cases:
+            for page_size in (2, 10):
+                with self.subTest(params, page_size=page_size):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(
+                            reverse("room_data"), {**params, "page_size": page_size}
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    rooms = response.data["data"]
+                    self.assertEqual(len(rooms), page_size)
+                    self.assertEqual(len(rooms[0]["room_images"]), 2)
+
+    def test_sparse_fieldsets(self):
+        url = reverse("room_data")
+        # Only the rooms query: room_images is not asked for
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"fields": "id,title,nope"})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(response.data["data"][0]), {"id", "title"})
+        self.assertNotIn('"content"', queries[0]["sql"])
+
+        response = self.client.get(url, {"omit": "content,room_images"})
+        room = response.data["data"][0]
+        self.assertNotIn("content", room)
+        self.assertIn("price", room)
+
+
+class RoomSearchTests(TestCase):
+    """?q= full-text search (search.py) on the SQLite FTS5 backend"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("asha", password="pw-12345")
+        cls.title_match = cls.room("Lakeside room", "Quiet and bright")
+        cls.content_match = cls.room("Studio", "Big window with a lakeside view")
+        cls.address_match = cls.room("Flat", "Near the bus park", "Lakeside road")
+        cls.other = cls.room("Garage", "Parking only")
+
+    @classmethod
+    def room(cls, title, content, address=None):
+        return Room.objects.create(
+            user=cls.user,
+            title=title,
+            content=content,
+            address=address,
+            is_furnished=Room.FURNISHED_CHOICE[0][0],
+            price=Decimal(5000),
+            mobile_number="9800000000",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse("room_data"), {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [room["id"] for room in response.data["data"]]
+
+    def test_ranked_by_column_weight(self):
+        # title (10) before address (4) before content (1)
+        self.assertEqual(
+            self.search("lakeside"),
+            [self.title_match.pk, self.address_match.pk, self.content_match.pk],
+        )
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(len(self.search("lake")), 3)
+        self.assertEqual(self.search("lake qui"), [self.title_match.pk])
+        self.assertEqual(self.search("lakes garage"), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.title = "Lakeside garage"
+        self.other.save()
+        self.assertIn(self.other.pk, self.search("lakeside"))
+
+        self.title_match.title = "Hillside room"
+        self.title_match.save()
+        self.assertNotIn(self.title_match.pk, self.search("lakeside"))
+        self.assertEqual(self.search("hillside"), [self.title_match.pk])
+
+        self.content_match.delete()
+        self.assertNotIn(self.content_match.pk, self.search("lakeside"))
+
+    def test_keyset_pages_follow_relevance(self):
+        for index in range(12):
+            words = " ".join(["lakeside"] * (index % 4 + 1))
+            self.room(f"Room {index}", f"{words} and more text {index}")
+        expected = self.search("lakeside", page_size=100)
+        self.assertEqual(len(expected), 15)
+
+        ids, url = [], reverse("room_data")
+        params = {"q": "lakeside", "page_size": 4}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [room["id"] for room in response.data["data"]]
+            url, params = response.data["next"], None
+        self.assertEqual(ids, expected)
+
+    def test_blank_queries_do_not_search(self):
+        every_room = self.search("")
+        self.assertEqual(len(every_room), 4)
+        self.assertEqual(self.search("   "), every_room)
+        # Only punctuation: no words to look for
+        self.assertEqual(self.search("?!"), [])
+
+    def test_fts_syntax_is_quoted(self):
+        lakeside = self.search("lakeside")
+        for q in ('lakeside"', "lakeside*", "(lakeside", "^lakeside"):
+            with self.subTest(q):
+                self.assertEqual(self.search(q), lakeside)
+        # Operators are words like any other: both must match
+        self.assertEqual(self.search("lakeside OR"), [])
+        for q in ('"', "NEAR(a b)", "title:garage", "-lake", "AND OR NOT"):
+            with self.subTest(q):
+                self.search(q)
+
+
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        lookups.invalidate()
+        self.district = District.objects.create(name="Kaski")
+
+    def test_dropped_when_the_write_commits(self):
+        snapshot = lookups.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            City.objects.create(district=self.district, name="Pokhara")
+            # Not committed yet: other connections still see the old data
+            self.assertIs(lookups.get_snapshot(), snapshot)
+        self.assertEqual(len(callbacks), 1)
+        cities = lookups.get_snapshot().cities[self.district.id]
+        self.assertEqual([city["name"] for city in cities], ["Pokhara"])
+
+    def test_build_racing_an_invalidate_is_not_kept(self):
+        build = lookups._build
+
+        def build_then_invalidate():
+            snapshot = build()
+            lookups.invalidate()
+            return snapshot
+
+        with mock.patch.object(lookups, "_build", build_then_invalidate):
+            lookups.get_snapshot()
+        self.assertIsNone(lookups._snapshot)
+
+
+def png_upload(name, color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class BrokenUpload(SimpleUploadedFile):
+    def chunks(self, chunk_size=None):
+        raise OSError("disk full")
+
+
+class RoomImageUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        user = User.objects.create_user("asha", password="pw-12345")
+        self.room = Room.objects.create(
+            user=user,
+            title="Room",
+            content="Quiet room",
+            is_furnished=Room.FURNISHED_CHOICE[0][0],
+            price=Decimal(5000),
+            mobile_number="9800000000",
+        )
+
+    def test_derivatives_built_after_commit(self):
+        uploads = [png_upload("a.png"), png_upload("b.png", "blue")]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                images = save_room_images(self.room, uploads)
+                # Nothing resized while the transaction is open
+                self.assertFalse(
+                    any(has_derivatives(image.image.name) for image in images)
+                )
+        self.assertTrue(all(has_derivatives(image.image.name) for image in images))
+
+    def stored_files(self):
+        directory = os.path.join(self.media_root, "room", "images")
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_one_insert_for_the_batch(self):
+        uploads = [png_upload(f"{index}.png") for index in range(5)]
+        with self.assertNumQueries(1):
+            images = save_room_images(self.room, uploads)
+        self.assertTrue(all(image.pk for image in images))
+        self.assertEqual(self.room.room_images.count(), 5)
+        self.assertEqual(len(self.stored_files()), 5)
+
+    def test_failed_write_rolls_back_and_cleans_up(self):
+        uploads = [png_upload("a.png"), BrokenUpload("b.png", b""), png_upload("c.png")]
+        with self.assertRaisesMessage(OSError, "disk full"):
+            with transaction.atomic():
+                room = Room.objects.create(
+                    user=self.room.user,
+                    title="Second room",
+                    content="Quiet room",
+                    is_furnished=Room.FURNISHED_CHOICE[0][0],
+                    price=Decimal(6000),
+                    mobile_number="9800000000",
+                )
+                save_room_images(room, uploads)
+        self.assertFalse(Room.objects.filter(title="Second room").exists())
+        # The completed writes are removed again
+        self.assertNotIn("a.png", self.stored_files())
+        self.assertNotIn("c.png", self.stored_files())
+
+    def test_failed_insert_cleans_up(self):
+        uploads = [png_upload("a.png"), png_upload("b.png")]
+        with mock.patch.object(
+            RoomImage.objects, "bulk_create", side_effect=DatabaseError("gone")
+        ), self.assertRaises(DatabaseError):
+            save_room_images(self.room, uploads)
+        self.assertEqual(self.stored_files(), [])
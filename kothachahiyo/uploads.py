@@ -0,0 +1,78 @@
+"""
+Room image uploads
+Stores a batch of uploaded files for one room: the files are written to
+storage concurrently and the RoomImage rows go in with one bulk INSERT.
+Their derivatives (core/images.py) are built once the transaction has
+committed, so it is never held open while images are resized.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+from core.images import build_for_file
+
+from .models import RoomImage
+
+# Shared pool for storage writes; file I/O releases the GIL so a few
+# threads overlap the writes of one request (and of concurrent requests)
+UPLOAD_WORKERS = 4
+_executor = ThreadPoolExecutor(
+    max_workers=UPLOAD_WORKERS, thread_name_prefix="room-images"
+)
+
+
+def _store(image, upload):
+    # Same as assigning the file and calling save(), minus the INSERT
+    image.image.save(upload.name, upload, save=False)
+    return image
+
+
+def build_room_derivatives(images):
+    """
+    Build the sized variants and placeholders of stored images, in the
+    upload threads, and wait for them (an unreadable image is logged and
+    listed without variants)
+    """
+    list(_executor.map(build_for_file, [image.image for image in images]))
+
+
+def save_room_images(room, uploads):
+    """
+    Write uploads to storage and bulk insert their RoomImage rows
+
+    Call it inside the transaction that created the room. If any write or
+    the INSERT fails, files already written are removed and the error is
+    re-raised so the transaction rolls back. Derivatives are built when it
+    commits: a room response serialized after the atomic block has them.
+    Returns the new RoomImage objects (pks are set on SQLite/PostgreSQL).
+    """
+    if not uploads:
+        return []
+
+    images = [RoomImage(room=room) for _ in uploads]
+    futures = [
+        _executor.submit(_store, image, upload)
+        for image, upload in zip(images, uploads)
+    ]
+
+    stored, error = [], None
+    for future in futures:
+        try:
+            stored.append(future.result())
+        except Exception as exc:
+            error = error or exc
+
+    try:
+        if error is not None:
+            raise error
+        images = RoomImage.objects.bulk_create(images)
+    except Exception:
+        for image in stored:
+            image.image.delete(save=False)
+        raise
+
+    # Once committed, like core/signals.py: a rolled back upload has
+    # nothing to build
+    transaction.on_commit(lambda: build_room_derivatives(images))
+    return images
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import RoomView,DistrictView
+from .views import RoomView, DistrictView, DistrictCitiesView
 
 urlpatterns = [
     path("room/", RoomView.as_view(), name="room_data"),
     path("room/<int:pk>/", RoomView.as_view(), name="room_detail"),
-    path("districts/", DistrictView.as_view(), name='district')
+    path("districts/", DistrictView.as_view(), name='district'),
+    path("districts/<int:pk>/cities/", DistrictCitiesView.as_view(), name="district_cities"),
 ]
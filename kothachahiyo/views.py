@@ -1,53 +1,131 @@
+from django.db import transaction
+from django.utils.cache import get_conditional_response
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import RoomSerializer,DistrictSerializer
-from .models import Room, RoomImage, District
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .serializers import RoomSerializer
+from .models import Room
+from . import lookups
+from account.authentication import CachedJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
+from core.fastpath import compile_serializer
+from core.pagination import KeysetPagination, PagePagination
+from core.sparse import sparse_queryset
+from core.streaming import stream_json_list, wants_stream
+from .filters import filter_rooms
+from .uploads import save_room_images
 
 
 
+def cached_lookup_response(request, data, etag):
+    """
+    200 with data, or 304 when the client already has this ETag
+    Either way no database query is made (data comes from lookups)
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response({"data": data}, status=status.HTTP_200_OK)
+    response["ETag"] = etag
+    # Clients may keep it but must revalidate (cheap 304) before reuse
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 class DistrictView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+
     def get(self, request):
-        print("request",request)
-        queryset = District.objects.all()
-        serializer = DistrictSerializer(queryset, many=True)
-        return Response({"data": serializer.data}, status=status.HTTP_200_OK)
-    
+        snapshot = lookups.get_snapshot()
+        return cached_lookup_response(
+            request, snapshot.districts, snapshot.districts_etag
+        )
+
+
+class DistrictCitiesView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        snapshot = lookups.get_snapshot()
+        if pk not in snapshot.cities:
+            return Response(
+                {"message": "District not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return cached_lookup_response(
+            request, snapshot.cities[pk], snapshot.cities_etags[pk]
+        )
+
+
 
 class RoomView(APIView):
 
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    # Infinite scroll uses ?cursor=, clients asking for ?page= get page numbers
+    pagination_class = KeysetPagination
+    page_pagination_class = PagePagination
+
+    def get_queryset(self, serializer=None):
+        queryset = Room.objects.order_by("-id")
+        # Load every room's images in one extra query instead of one per room
+        # (skipped when ?fields=/?omit= leave room_images out)
+        if serializer is None or "room_images" in serializer.fields:
+            queryset = queryset.prefetch_related("room_images")
+        return queryset
+
+    def get_paginator(self, request):
+        if self.page_pagination_class.page_query_param in request.query_params:
+            return self.page_pagination_class()
+        return self.pagination_class()
 
     def get(self, request, pk=None):
+        # ?fields=/?omit= trim the output and the columns read (sparse fieldsets)
+        context = {"query_params": request.query_params}
+        projection = RoomSerializer(context=context)
 
         if pk:
             try:
-                room = Room.objects.get(pk=pk)
-                serializer = RoomSerializer(room)
+                queryset = sparse_queryset(self.get_queryset(projection), projection)
+                room = queryset.get(pk=pk)
+                serializer = RoomSerializer(room, context=context)
                 return Response({"data": serializer.data}, status=status.HTTP_200_OK)
             except Room.DoesNotExist:
                 return Response(
                     {"message": "Room not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-        queryset = Room.objects.all()
-        serializer = RoomSerializer(queryset, many=True)
-        return Response({"data": serializer.data}, status=status.HTTP_200_OK)
+        # Filters (price range, district, city, furnished, sort) from the query string
+        queryset = filter_rooms(self.get_queryset(projection), request.query_params)
+        queryset = sparse_queryset(queryset, projection)
+
+        # Rows are serialized from .values() (same output as RoomSerializer)
+        compiled = compile_serializer(RoomSerializer(many=True, context=context))
+
+        # ?stream=true: all matching rooms streamed in chunks, count at the end
+        if wants_stream(request):
+            return stream_json_list(request, queryset, compiled, envelope={}, count_key="count")
+
+        # List is paginated: one page query, one image query, optional count
+        paginator = self.get_paginator(request)
+        page = paginator.paginate_queryset(
+            compiled.values(queryset), request, view=self
+        )
+        return paginator.get_paginated_response(compiled.serialize(page))
 
     def post(self, request):
         serializer = RoomSerializer(data=request.data)
         if serializer.is_valid():
-            room = serializer.save(user=request.user)
+            # Room and its images are saved together or not at all
+            with transaction.atomic():
+                room = serializer.save(user=request.user)
+
+                # Upload multiple images: parallel file writes, one bulk INSERT
+                images = save_room_images(room, request.FILES.getlist("images"))
 
-            # Upload multiple images
-            images = request.FILES.getlist("images")
-            for img in images:
-                RoomImage.objects.create(room=room, image=img)
+            # Serialize from memory: hand the new images over as prefetched
+            # so room_images does not query them back
+            room._prefetched_objects_cache = {"room_images": images}
 
             return Response(
                 {"message": "Room created", "room": RoomSerializer(room).data},
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class TodoConfig(AppConfig):
     name = "todo"
+
+    def ready(self):
+        # Reminder delivery by e-mail (TODO_REMINDER_EMAILS)
+        from . import delivery
+
+        delivery.connect()
@@ -0,0 +1,63 @@
+"""
+E-mail delivery of todo reminders
+
+email_reminders() receives reminder_due (todo/reminders.py) and sends one
+e-mail per reminder to the todo owner's address, all of a batch over one
+connection to the mail server (EMAIL_* settings). It is connected by
+TodoConfig.ready() when TODO_REMINDER_EMAILS is on.
+
+Reminders of users without an e-mail address count as delivered: there is
+nothing to retry for them.
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+
+def reminder_message(reminder, address):
+    body = reminder["title"]
+    if reminder["due_at"]:
+        due = serializers.DateTimeField().to_representation(reminder["due_at"])
+        body += f"\n\nDue: {due}"
+    return EmailMessage(f"Reminder: {reminder['title']}", body, to=[address])
+
+
+def email_reminders(sender, reminders, **kwargs):
+    """Returns the ids of the reminders sent (or with no address to send to)"""
+    addresses = dict(
+        User.objects.filter(
+            pk__in={reminder["user_id"] for reminder in reminders}
+        ).values_list("pk", "email")
+    )
+    delivered = []
+    messages = []
+    for reminder in reminders:
+        address = addresses.get(reminder["user_id"])
+        if address:
+            messages.append((reminder["id"], reminder_message(reminder, address)))
+        else:
+            delivered.append(reminder["id"])
+
+    if messages:
+        with get_connection(fail_silently=False) as connection:
+            for reminder_id, message in messages:
+                try:
+                    connection.send_messages([message])
+                except Exception:
+                    logger.exception("Could not e-mail reminder %s", reminder_id)
+                else:
+                    delivered.append(reminder_id)
+    return delivered
+
+
+def connect():
+    if getattr(settings, "TODO_REMINDER_EMAILS", False):
+        from .reminders import reminder_due
+
+        reminder_due.connect(email_reminders, dispatch_uid="todo_reminder_emails")
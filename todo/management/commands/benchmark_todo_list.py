@@ -0,0 +1,179 @@
+"""
+Show that one user's todo list costs the same however big the table gets
+
+    python manage.py benchmark_todo_list
+    python manage.py benchmark_todo_list --rows 1000000 10000000 --explain
+
+Fills the todo table with other users' todos up to each --rows size
+(inside a transaction that is rolled back at the end) while one user
+keeps --user-todos todos, then times the three queries TodoView runs:
+the first page, a cursor page halfway down and the first page's count.
+
+For each query the plan is checked: it must be a range scan of
+todo_user_created_live_idx, in index order (no sort, no table scan).
+The page queries still read each row's other columns from the table,
+one heap lookup per row returned; the index only decides which rows and
+in what order, which is what keeps them from growing with the table.
+The count walks the same index range. PostgreSQL can answer it from the
+index alone (Index Only Scan, plus heap fetches for pages VACUUM has not
+marked all-visible yet); SQLite still reads each row to check the
+deleted_at condition, so its verdict is "index range + heap". Either way
+it grows with the user's todos, not with the table.
+
+The command fails (exit status 1) if any plan regresses, so it can run
+in CI. --explain prints the full plans (EXPLAIN ANALYZE with buffers on
+PostgreSQL, EXPLAIN QUERY PLAN on SQLite).
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from todo.models import Todo
+from todo.views import TodoPagination
+
+INDEX_NAME = "todo_user_created_live_idx"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the per-user todo list queries as the table grows (data is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[10000, 100000, 1000000]
+        )
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--user-todos", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--explain", action="store_true")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.regressions = []
+        try:
+            with transaction.atomic():
+                self.run()
+                raise Rollback
+        except Rollback:
+            pass
+        if self.regressions:
+            raise CommandError("Query plan regressed: " + ", ".join(self.regressions))
+
+    def run(self):
+        options = self.options
+        user = User.objects.create(username="benchmark-todo-list")
+        Todo.objects.bulk_create(
+            [
+                Todo(user=user, title=f"Todo {i}", description="x" * 100)
+                for i in range(options["user_todos"])
+            ],
+            batch_size=options["batch_size"],
+        )
+        others = User.objects.bulk_create(
+            [User(username=f"benchmark-todo-list-{i}") for i in range(options["users"])]
+        )
+        # Backends without RETURNING leave pks unset: load them back
+        if others and others[0].pk is None:
+            others = list(
+                User.objects.filter(username__startswith="benchmark-todo-list-")
+            )
+
+        filled = options["user_todos"]
+        for size in sorted(options["rows"]):
+            if size > filled:
+                self.fill(others, size - filled)
+                filled = size
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE todo_todo")
+            self.measure(user, filled)
+
+    def fill(self, users, count):
+        batch_size = self.options["batch_size"]
+        for start in range(0, count, batch_size):
+            Todo.objects.bulk_create(
+                [
+                    Todo(
+                        user=users[i % len(users)],
+                        title=f"Todo {i}",
+                        description="x" * 100,
+                    )
+                    for i in range(start, min(start + batch_size, count))
+                ]
+            )
+
+    def measure(self, user, size):
+        paginator = TodoPagination()
+        live = Todo.objects.filter(user=user)
+        ordered = paginator.order_queryset(live.order_by("-created_at", "-id"))
+        middle = ordered.values("created_at", "id")[self.options["user_todos"] // 2]
+        position = [middle[field] for field, _ in paginator.keys]
+
+        queries = [
+            ("first page", lambda: list(ordered[: paginator.page_size + 1])),
+            (
+                "cursor page",
+                lambda: list(
+                    ordered.filter(paginator.after(position))[: paginator.page_size + 1]
+                ),
+            ),
+            ("count", live.count),
+        ]
+
+        results = []
+        for label, run in queries:
+            with CaptureQueriesContext(connection) as captured:
+                run()
+            plan = self.explain(captured.captured_queries[-1]["sql"])
+            best = min(self.timed(run) for _ in range(self.options["repeat"]))
+            verdict, ok = self.verdict(plan)
+            if not ok:
+                self.regressions.append(f"{label} at {size} rows ({verdict})")
+            results.append(f"{label} {best * 1000:7.2f} ms ({verdict})")
+            if self.options["explain"]:
+                self.stdout.write(f"-- {label}, {size} rows\n{plan}")
+
+        self.stdout.write(f"{size:>10} rows: " + "  ".join(results))
+
+    @staticmethod
+    def timed(run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    def explain(self, sql):
+        options = {}
+        if connection.vendor == "postgresql":
+            options = {"analyze": True, "buffers": True}
+        prefix = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+    @staticmethod
+    def verdict(plan):
+        """(description, whether the plan is the intended one)"""
+        if INDEX_NAME not in plan:
+            return "NOT using index", False
+        upper = plan.upper()
+        if "TEMP B-TREE" in upper or "SORT" in upper.replace("SORT KEY", ""):
+            return "index + sort", False
+        # PostgreSQL Seq Scan; SQLite SCAN reads the whole table or index
+        # instead of a SEARCH over one user's range
+        if "SEQ SCAN" in upper or any(
+            line.split(" ", 3)[-1].startswith("SCAN ") for line in upper.splitlines()
+        ):
+            return "full scan", False
+        if "INDEX ONLY SCAN" in upper or "COVERING INDEX" in upper:
+            return "index only", True
+        return "index range + heap", True
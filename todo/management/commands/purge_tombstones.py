@@ -0,0 +1,53 @@
+"""
+Delete todo tombstones older than the retention window
+
+    python manage.py purge_tombstones
+    python manage.py purge_tombstones --days 60
+
+Deleted todos stay as tombstones so delta sync can tell clients about the
+delete (todo/views.py TodoSyncView). Once a tombstone's last change is
+older than --days (default TODO_TOMBSTONE_RETENTION_DAYS) it is removed;
+sync tokens that old are refused with 410 Gone, so no client can still
+need it. Rows are deleted --batch-size at a time to keep transactions
+short. Run it daily, e.g. from cron.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from todo.models import Todo
+
+
+class Command(BaseCommand):
+    help = "Delete todo tombstones older than the sync retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.TODO_TOMBSTONE_RETENTION_DAYS
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Never purge more than the sync view allows for
+        if options["days"] < settings.TODO_TOMBSTONE_RETENTION_DAYS:
+            raise CommandError(
+                "--days must be at least TODO_TOMBSTONE_RETENTION_DAYS "
+                f"({settings.TODO_TOMBSTONE_RETENTION_DAYS}): sync tokens "
+                "younger than that still need the tombstones"
+            )
+        # updated_at, not deleted_at: a tombstone changed since its delete
+        # is newer than that for the sync tokens
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        tombstones = Todo.all_objects.filter(
+            deleted_at__isnull=False, updated_at__lt=cutoff
+        )
+
+        purged = 0
+        while ids := list(
+            tombstones.values_list("id", flat=True)[: options["batch_size"]]
+        ):
+            purged += Todo.all_objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f"Purged {purged} tombstones older than {cutoff:%Y-%m-%d}")
@@ -0,0 +1,43 @@
+"""
+Reminder scheduler
+
+    python manage.py run_reminders            # runs until stopped
+    python manage.py run_reminders --once     # one tick (e.g. from cron)
+
+Every --interval seconds sends the todo reminders that are due (see
+todo/reminders.py). Several schedulers may run at once on databases with
+SELECT ... SKIP LOCKED (PostgreSQL); elsewhere run only one.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo.reminders import BATCH_SIZE, TICK_LIMIT, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Send due todo reminders, once or in a loop"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--interval", type=float, default=30)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=TICK_LIMIT,
+            help="Reminders sent per tick at most, the rest wait for the next",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            sent = send_due_reminders(
+                batch_size=options["batch_size"], limit=options["limit"]
+            )
+            if options["verbosity"] > 1 or (sent and options["once"]):
+                self.stdout.write(f"Sent {sent} reminders")
+            if options["once"]:
+                return
+            time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 00:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing todos were last changed when they were created, as far as we know
+    Todo = apps.get_model("todo", "Todo")
+    Todo.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="todo",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="todo",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                fields=["user", "updated_at", "id"], name="todo_user_updated_idx"
+            ),
+        ),
+    ]
@@ -5,6 +5,17 @@ Models define the database tables and their fields
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class TodoManager(models.Manager):
+    """
+    Default manager: hides deleted todos (tombstones)
+    Use Todo.all_objects to include them (delta sync)
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Todo(models.Model):
@@ -16,6 +27,11 @@ class Todo(models.Model):
     - title: Short title/name of the todo (max 50 characters)
     - description: Detailed description of what needs to be done
     - created_at: Timestamp when the todo was created (auto-set)
+    - updated_at: Timestamp of the last change, deletes included (auto-set)
+    - deleted_at: Set when the todo is deleted (the row stays as a tombstone
+      so syncing clients learn about the delete)
+    - due_at / remind_at: Optional deadline and reminder time
+    - reminded_at: When the reminder was sent (null while pending)
     - id: Primary key (auto-generated by Django)
     """
 
@@ -37,6 +53,30 @@ class Todo(models.Model):
     # You don't need to provide this value - Django sets it automatically
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # auto_now=True means this is updated on every save()
+    # NOTE: update() and bulk_update() do not touch it, set it yourself there
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # null=True: the todo is live; a timestamp: the todo was deleted
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    # Optional deadline and reminder time (see todo/reminders.py)
+    # reminded_at is set once the reminder has been sent
+    due_at = models.DateTimeField(null=True, blank=True)
+    remind_at = models.DateTimeField(null=True, blank=True)
+    reminded_at = models.DateTimeField(null=True, blank=True)
+
+    # Todo.objects skips deleted todos, Todo.all_objects returns every row
+    objects = TodoManager()
+    all_objects = models.Manager()
+
+    def soft_delete(self):
+        """
+        Delete the todo but keep a tombstone for delta sync
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at", "updated_at"])
+
     def __str__(self):
         """
         String representation of the Todo object
@@ -49,3 +89,28 @@ class Todo(models.Model):
         # Order todos by creation date (newest first)
         # This affects how todos are displayed in queries
         ordering = ["-created_at"]
+
+        indexes = [
+            # The todo list: a user's live todos newest first, read in index
+            # order (no sort) and counted over the same index range
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="todo_user_created_live_idx",
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            # Delta sync reads a user's changes in (updated_at, id) order
+            models.Index(
+                fields=["user", "updated_at", "id"], name="todo_user_updated_idx"
+            ),
+            # Reminder scheduler: only pending reminders are in this index,
+            # so it stays small however many todos exist
+            models.Index(
+                fields=["remind_at", "id"],
+                name="todo_pending_reminder_idx",
+                condition=models.Q(
+                    remind_at__isnull=False,
+                    reminded_at__isnull=True,
+                    deleted_at__isnull=True,
+                ),
+            ),
+        ]
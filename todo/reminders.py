@@ -0,0 +1,132 @@
+"""
+Todo reminders
+
+Pending reminders (remind_at set, not yet sent, todo not deleted) live in
+the partial index todo_pending_reminder_idx, so finding the due ones reads
+only that small index, never the whole todo table.
+
+send_due_reminders() claims the due reminders straight from that index,
+oldest first, batch_size at a time:
+
+    remind_at <= now AND reminded_at IS NULL ... ORDER BY remind_at, id
+    LIMIT batch_size
+
+(locked with SKIP LOCKED where the database supports it, so several
+schedulers can run side by side), marks them sent with one UPDATE and,
+once that has committed, sends reminder_due for the batch. It stops after
+a short batch or once limit reminders were claimed in this tick; the rest
+wait for the next tick. A batch costs the same handful of queries however
+its reminders are spread over time.
+
+Receivers of reminder_due get reminders=[{"id", "user_id", "title",
+"due_at", "remind_at"}, ...], do the actual delivery (push, e-mail) and
+return the ids they delivered. Reminders no receiver confirmed (or whose
+receiver raised) are put back at the end of the tick and retried on the
+next one. With no receiver connected nothing is claimed at all. A
+scheduler killed between the claim and the delivery loses that batch:
+reminders are sent at most once. todo/delivery.py has the e-mail
+receiver (TODO_REMINDER_EMAILS).
+"""
+
+import logging
+
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Todo
+
+logger = logging.getLogger(__name__)
+
+# Sent with reminders=[...] after a batch has been claimed; receivers
+# return the ids they delivered
+reminder_due = Signal()
+
+BATCH_SIZE = 500
+# Reminders claimed per tick at most, so one tick can't run unbounded
+TICK_LIMIT = 10_000
+REMINDER_COLUMNS = ["id", "user_id", "title", "due_at", "remind_at"]
+
+
+def pending_reminders():
+    # Same condition as the partial index, so the planner can use it
+    return Todo.all_objects.filter(
+        remind_at__isnull=False, reminded_at__isnull=True, deleted_at__isnull=True
+    )
+
+
+def claim_batch(now, batch_size):
+    """
+    Mark up to batch_size reminders due by now as sent, oldest first
+    Returns them (as dicts) and the time they were marked with; call
+    inside a transaction
+    """
+    queryset = pending_reminders().filter(remind_at__lte=now)
+    if connection.features.has_select_for_update_skip_locked:
+        # Rows claimed by another scheduler are skipped, not waited for
+        queryset = queryset.select_for_update(skip_locked=True)
+    batch = list(
+        queryset.order_by("remind_at", "id").values(*REMINDER_COLUMNS)[:batch_size]
+    )
+    claimed_at = timezone.now()
+    if batch:
+        # update() skips auto_now: set updated_at for delta sync ourselves
+        Todo.all_objects.filter(pk__in=[row["id"] for row in batch]).update(
+            reminded_at=claimed_at, updated_at=claimed_at
+        )
+    return batch, claimed_at
+
+
+def deliver(batch):
+    """Send reminder_due for batch; returns the ids a receiver delivered"""
+    delivered = set()
+    for receiver, result in reminder_due.send_robust(sender=Todo, reminders=batch):
+        if isinstance(result, Exception):
+            logger.error("Reminder receiver %r failed", receiver, exc_info=result)
+        elif result:
+            delivered.update(result)
+    return delivered
+
+
+def release(ids, claimed_at):
+    """Make claimed but undelivered reminders pending again"""
+    # Only rows still carrying this claim: a todo re-armed or claimed again
+    # meanwhile is left alone
+    return Todo.all_objects.filter(pk__in=ids, reminded_at=claimed_at).update(
+        reminded_at=None, updated_at=timezone.now()
+    )
+
+
+def send_due_reminders(now=None, batch_size=BATCH_SIZE, limit=TICK_LIMIT):
+    """
+    Send the reminders due by now, at most limit of them
+    Returns how many were delivered; call outside a transaction
+    """
+    now = now or timezone.now()
+    if not reminder_due.has_listeners(Todo):
+        logger.warning("No reminder_due receiver connected: reminders left pending")
+        return 0
+
+    claimed = sent = 0
+    undelivered = []
+    while claimed < limit:
+        with transaction.atomic():
+            batch, claimed_at = claim_batch(now, min(batch_size, limit - claimed))
+        claimed += len(batch)
+        # Claim committed: another scheduler won't pick these up
+        if batch:
+            delivered = deliver(batch)
+            failed = [row["id"] for row in batch if row["id"] not in delivered]
+            sent += len(batch) - len(failed)
+            if failed:
+                undelivered.append((failed, claimed_at))
+        if len(batch) < batch_size:
+            break
+
+    # Put back only now, so this tick doesn't claim them again
+    for ids, claimed_at in undelivered:
+        released = release(ids, claimed_at)
+        logger.warning("%d todo reminders not delivered, will retry", released)
+    if sent:
+        logger.info("Sent %d todo reminders", sent)
+    return sent
@@ -0,0 +1,90 @@
+"""
+Todo export renderers (CSV and NDJSON)
+
+Selected with ?format=csv / ?format=ndjson (or the Accept header).
+stream() encodes rows for a StreamingHttpResponse a chunk at a time;
+render() handles ordinary responses, such as errors, in the same format.
+
+CSV cells starting with =, +, -, @, tab or carriage return get a leading
+apostrophe: spreadsheets would otherwise run them as formulas (CSV
+injection) when the export is opened.
+"""
+
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Rows encoded per chunk written to the response
+CHUNK_ROWS = 1000
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def stream(self, columns, rows):
+        """columns: header names, rows: iterable of value tuples"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for chunk in _chunks(rows):
+            writer.writerows([_cell(value) for value in row] for row in chunk)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only, when there are no rows
+        if buffer.tell():
+            yield buffer.getvalue().encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        columns = list(rows[0]) if rows and isinstance(rows[0], dict) else []
+        values = ([row.get(column) for column in columns] for row in rows)
+        return b"".join(self.stream(columns, values))
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def stream(self, columns, rows):
+        """One JSON object per line, keys from columns"""
+        for chunk in _chunks(rows):
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), cls=JSONEncoder, ensure_ascii=False)
+                + "\n"
+                for row in chunk
+            ).encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return "".join(
+            json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + "\n" for row in rows
+        ).encode()
@@ -18,6 +18,10 @@ class TodoSerializer(serializers.ModelSerializer):
     - title: Todo item title (required, max 50 characters)
     - description: Detailed description of the todo (required)
     - created_at: Timestamp when todo was created (read-only, auto-generated)
+    - updated_at: Timestamp of the last change (read-only, auto-generated)
+    - due_at: Optional deadline
+    - remind_at: Optional reminder time (not after due_at)
+    - reminded_at: When the reminder was sent (read-only)
     - user: The user who owns this todo (read-only, set automatically from request)
     """
 
@@ -27,11 +31,21 @@ class TodoSerializer(serializers.ModelSerializer):
 
         # List all fields that should be included in the API response
         # These fields will be converted to/from JSON
-        fields = ["id", "title", "description", "created_at", "user"]
+        fields = [
+            "id",
+            "title",
+            "description",
+            "created_at",
+            "updated_at",
+            "due_at",
+            "remind_at",
+            "reminded_at",
+            "user",
+        ]
 
         # Read-only fields cannot be set by the user in POST/PUT requests
         # They are automatically set by the system
-        read_only_fields = ["id", "created_at", "user"]
+        read_only_fields = ["id", "created_at", "updated_at", "reminded_at", "user"]
 
     # You can add custom validation here if needed
     # For example, to ensure title is not empty:
@@ -43,3 +57,29 @@ class TodoSerializer(serializers.ModelSerializer):
         if not value.strip():
             raise serializers.ValidationError("Title cannot be empty")
         return value.strip()
+
+    def validate(self, data):
+        """
+        A reminder after the deadline makes no sense
+        Values not sent in this request are taken from the saved todo
+        """
+        due_at = data.get("due_at", getattr(self.instance, "due_at", None))
+        remind_at = data.get("remind_at", getattr(self.instance, "remind_at", None))
+        if due_at and remind_at and remind_at > due_at:
+            raise serializers.ValidationError(
+                {"remind_at": ["Reminder must not be after the due date"]}
+            )
+        return data
+
+    def update(self, instance, validated_data):
+        reset_reminder(instance, validated_data)
+        return super().update(instance, validated_data)
+
+
+def reset_reminder(todo, validated_data):
+    """
+    A new reminder time means the reminder has to be sent again
+    Call before copying validated_data onto todo
+    """
+    if "remind_at" in validated_data and validated_data["remind_at"] != todo.remind_at:
+        todo.reminded_at = None
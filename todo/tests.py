@@ -1,3 +1,472 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import delivery, reminders
+from .models import Todo
+from .serializers import TodoSerializer
+
+
+def cursor(signature, position):
+    payload = json.dumps([signature, position]).encode()
+    return urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def read_cursor(url, param):
+    encoded = parse_qs(urlparse(url).query)[param][0]
+    return json.loads(urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+
+
+class CursorTests(TestCase):
+    """Forged cursors are a 404, never a 500 (core/pagination.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("asha", password="pw-12345")
+        Todo.objects.bulk_create(
+            Todo(user=cls.user, title=f"Todo {index}", description="")
+            for index in range(5)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_next_cursor_pages_through(self):
+        url = reverse("todo_name")
+        first = self.client.get(url, {"page_size": 3}).data
+        second = self.client.get(first["next"]).data
+        titles = [todo["title"] for todo in first["data"] + second["data"]]
+        self.assertEqual(len(set(titles)), 5)
+        self.assertIsNone(second["next"])
+
+    def test_forged_cursors(self):
+        first = self.client.get(reverse("todo_name"), {"page_size": 2}).data
+        signature, position = read_cursor(first["next"], "cursor")
+        for name, param, signature in (
+            ("todo_name", "cursor", signature),
+            ("todo_sync", "since", "updated_at,id"),
+        ):
+            url = reverse(name)
+            self.assertEqual(
+                self.client.get(url, {param: cursor(signature, position)}).status_code,
+                200,
+            )
+            for forged in (
+                "garbage",
+                cursor(signature, "garbage"),
+                cursor(signature, {"a": 1}),
+                cursor(signature, None),
+                cursor(signature, 7),
+                cursor(signature, [{"a": 1}] * len(position)),
+                cursor(signature, ["garbage"] * len(position)),
+                cursor(signature, [None] * len(position)),
+                cursor(signature, position[:1]),
+                cursor("other,order", position),
+            ):
+                with self.subTest(name=name, cursor=forged):
+                    response = self.client.get(url, {param: forged})
+                    self.assertEqual(response.status_code, 404)
+
+
+class CompiledSwitchTests(TestCase):
+    """settings.COMPILED_SERIALIZERS = False: same responses, from DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("asha", password="pw-12345")
+        todos = Todo.objects.bulk_create(
+            Todo(user=cls.user, title=f"Todo {index}", description="")
+            for index in range(4)
+        )
+        # Old enough for sync's settle window, one of them deleted
+        Todo.all_objects.filter(user=cls.user).update(
+            updated_at=timezone.now() - timedelta(minutes=1)
+        )
+        Todo.all_objects.filter(pk=todos[0].pk).update(deleted_at=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return response.json()
+
+    def test_same_output(self):
+        since = cursor(
+            "updated_at,id", [(timezone.now() - timedelta(minutes=2)).isoformat(), 0]
+        )
+        for name, params in (
+            ("todo_name", {}),
+            ("todo_name", {"stream": "true"}),
+            ("todo_sync", {}),
+            ("todo_sync", {"since": since}),
+        ):
+            with self.subTest(name, **params):
+                compiled = self.get(name, **params)
+                with override_settings(COMPILED_SERIALIZERS=False):
+                    plain = self.get(name, **params)
+                # Sync tokens move with the clock
+                compiled.pop("token", None)
+                plain.pop("token", None)
+                self.assertEqual(plain, compiled)
+        self.assertEqual(len(self.get("todo_sync", since=since)["deleted"]), 1)
+
+
+class TombstoneTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def todo(self, age, deleted=False):
+        todo = Todo.objects.create(user=self.user, title="Todo", description="")
+        changed = timezone.now() - age
+        Todo.all_objects.filter(pk=todo.pk).update(
+            updated_at=changed, deleted_at=changed if deleted else None
+        )
+        return todo
+
+    def test_purge_keeps_recent_tombstones(self):
+        old = self.todo(timedelta(days=40), deleted=True)
+        recent = self.todo(timedelta(days=5), deleted=True)
+        live = self.todo(timedelta(days=40))
+        call_command("purge_tombstones", stdout=io.StringIO())
+        self.assertEqual(
+            set(Todo.all_objects.values_list("id", flat=True)), {recent.id, live.id}
+        )
+        self.assertNotEqual(old.id, recent.id)
+
+    def test_purge_refuses_a_shorter_window(self):
+        with self.assertRaises(CommandError):
+            call_command("purge_tombstones", days=1, stdout=io.StringIO())
+
+    def test_expired_token_is_gone(self):
+        changed = timezone.now() - timedelta(days=40)
+        token = cursor("updated_at,id", [changed.isoformat(), 1])
+        response = self.client.get(reverse("todo_sync"), {"since": token})
+        self.assertEqual(response.status_code, 410)
+
+    def test_caught_up_token_stays_fresh(self):
+        # Nothing changed for longer than the retention: the token handed
+        # out is still valid
+        self.todo(timedelta(days=40))
+        token = self.client.get(reverse("todo_sync")).data["token"]
+        response = self.client.get(reverse("todo_sync"), {"since": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"], [])
+
+    @override_settings(TODO_SYNC_SETTLE_SECONDS=120)
+    def test_settle_time_from_settings(self):
+        self.todo(timedelta(seconds=60))
+        self.assertEqual(self.client.get(reverse("todo_sync")).data["data"], [])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, format):
+        response = self.client.get(reverse("todo_export"), {"format": format})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_formulas_are_escaped(self):
+        titles = ["=1+1", "+SUM(A1)", "-2", "@cmd", "\tx", "Groceries"]
+        Todo.objects.bulk_create(
+            Todo(user=self.user, title=title, description="") for title in titles
+        )
+        rows = list(csv.DictReader(io.StringIO(self.export("csv"))))
+        self.assertEqual(
+            [row["title"] for row in rows],
+            ["'=1+1", "'+SUM(A1)", "'-2", "'@cmd", "'\tx", "Groceries"],
+        )
+
+    def test_ndjson_is_unchanged(self):
+        Todo.objects.create(user=self.user, title="=1+1", description="")
+        rows = [json.loads(line) for line in self.export("ndjson").splitlines()]
+        self.assertEqual(rows[0]["title"], "=1+1")
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.earlier = timezone.now() - timedelta(days=1)
+        self.first, self.second = [
+            Todo.objects.create(user=self.user, title=title, description="")
+            for title in ("First", "Second")
+        ]
+        Todo.objects.update(updated_at=self.earlier)
+
+    def bulk(self, *operations):
+        return self.client.post(
+            reverse("todo_bulk"), {"operations": list(operations)}, format="json"
+        )
+
+    def update(self, todo, title="Changed"):
+        return {
+            "op": "update",
+            "id": todo.pk,
+            "data": {"title": title, "description": "Notes"},
+        }
+
+    def assert_unchanged(self):
+        rows = Todo.all_objects.filter(user=self.user)
+        self.assertEqual(rows.count(), 2)
+        for todo in rows:
+            self.assertIsNone(todo.deleted_at)
+            self.assertEqual(todo.updated_at, self.earlier)
+            self.assertIn(todo.title, ("First", "Second"))
+
+    def assert_rejected(self, response, index, field, message):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["errors"]), 1)
+        error = response.data["errors"][0]
+        self.assertEqual(error["index"], index)
+        self.assertIn(message, str(error["errors"][field]))
+        self.assert_unchanged()
+
+    def test_results_per_operation(self):
+        response = self.bulk(
+            {"op": "create", "data": {"title": "New", "description": "Notes"}},
+            self.update(self.first),
+            {"op": "delete", "id": self.second.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        created, updated, deleted = response.data["data"]
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual((created["op"], created["data"]["title"]), ("create", "New"))
+        self.assertEqual(updated["data"]["id"], self.first.pk)
+        self.assertEqual(deleted, {"op": "delete", "id": self.second.pk})
+
+        self.first.refresh_from_db()
+        second = Todo.all_objects.get(pk=self.second.pk)
+        self.assertEqual(self.first.title, "Changed")
+        self.assertIsNotNone(second.deleted_at)
+        # bulk_update()/update() skip auto_now: the view bumps updated_at
+        # itself, so delta sync sees both changes
+        self.assertGreater(self.first.updated_at, self.earlier)
+        self.assertGreater(second.updated_at, self.earlier)
+        self.assertEqual(second.updated_at, self.first.updated_at)
+
+    def test_other_users_todos_are_rejected(self):
+        other = User.objects.create_user("bina", password="pw-12345")
+        theirs = Todo.objects.create(user=other, title="Theirs", description="")
+        response = self.bulk(self.update(self.first), {"op": "delete", "id": theirs.pk})
+        self.assert_rejected(response, 1, "id", "Todo not found")
+        self.assertTrue(Todo.objects.filter(pk=theirs.pk).exists())
+
+    def test_one_invalid_operation_applies_nothing(self):
+        response = self.bulk(
+            {"op": "create", "data": {"title": "New", "description": "Notes"}},
+            {"op": "delete", "id": self.second.pk},
+            self.update(self.first, title="x" * 51),
+        )
+        self.assert_rejected(response, 2, "title", "50")
+
+    def test_database_error_rolls_back(self):
+        with mock.patch.object(
+            Todo.objects, "bulk_create", side_effect=DatabaseError("disk full")
+        ), self.assertRaises(DatabaseError):
+            self.bulk(
+                self.update(self.first),
+                {"op": "delete", "id": self.second.pk},
+                {"op": "create", "data": {"title": "New", "description": "Notes"}},
+            )
+        self.assert_unchanged()
+
+    def test_duplicate_ids(self):
+        response = self.bulk(
+            self.update(self.first), {"op": "delete", "id": self.first.pk}
+        )
+        self.assert_rejected(response, 1, "id", "Duplicate todo")
+
+    def test_deleted_todos_are_not_found(self):
+        self.second.soft_delete()
+        Todo.all_objects.update(updated_at=self.earlier)
+        response = self.bulk(self.update(self.second))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Todo not found", str(response.data["errors"][0]["errors"]))
+        self.assertEqual(Todo.all_objects.get(pk=self.second.pk).title, "Second")
+
+
+class BenchmarkTests(TestCase):
+    options = {"rows": [300], "users": 3, "user_todos": 50, "repeat": 1}
+
+    def test_plans_use_the_index(self):
+        out = io.StringIO()
+        call_command("benchmark_todo_list", stdout=out, **self.options)
+        self.assertIn("300 rows", out.getvalue())
+
+    def test_regressed_plan_fails(self):
+        with mock.patch(
+            "todo.management.commands.benchmark_todo_list.Command.explain",
+            return_value="2 0 0 SCAN todo_todo",
+        ), self.assertRaisesMessage(CommandError, "NOT using index"):
+            call_command("benchmark_todo_list", stdout=io.StringIO(), **self.options)
+
+
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("asha", password="pw-12345")
+        self.now = timezone.now()
+        self.batches = []
+        reminders.reminder_due.connect(self.receive)
+        self.addCleanup(reminders.reminder_due.disconnect, self.receive)
+
+    def receive(self, sender, reminders, **kwargs):
+        ids = [row["id"] for row in reminders]
+        self.batches.append(ids)
+        return ids
+
+    def todos(self, count, spacing=timedelta(hours=1)):
+        # Overdue, oldest first
+        return Todo.objects.bulk_create(
+            Todo(
+                user=self.user,
+                title=f"Todo {index}",
+                description="",
+                remind_at=self.now - spacing * (count - index),
+            )
+            for index in range(count)
+        )
+
+    def send(self, **kwargs):
+        return reminders.send_due_reminders(now=self.now, **kwargs)
+
+    def sent_ids(self):
+        return [todo_id for batch in self.batches for todo_id in batch]
+
+    def test_batches_are_sized_by_rows(self):
+        self.todos(1200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.send(batch_size=500), 1200)
+        self.assertEqual([len(batch) for batch in self.batches], [500, 500, 200])
+        # Savepoint, claim, update, release per batch
+        self.assertLessEqual(len(queries), 3 * 4)
+
+    def test_tick_limit(self):
+        self.todos(30)
+        self.assertEqual(self.send(batch_size=20, limit=25), 25)
+        self.assertEqual([len(batch) for batch in self.batches], [20, 5])
+        self.assertEqual(self.send(batch_size=20, limit=25), 5)
+
+    def test_claimed_only_once(self):
+        todos = self.todos(3)
+        self.assertEqual(self.send(), 3)
+        self.assertEqual(self.send(), 0)
+        self.assertEqual(self.sent_ids(), [todo.id for todo in todos])
+        self.assertEqual(
+            Todo.objects.filter(reminded_at__isnull=False).count(), len(todos)
+        )
+
+    def test_future_and_deleted_todos_are_skipped(self):
+        due, deleted = self.todos(2)
+        deleted.soft_delete()
+        Todo.objects.create(
+            user=self.user,
+            title="Later",
+            description="",
+            remind_at=self.now + timedelta(hours=1),
+        )
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(self.sent_ids(), [due.id])
+
+    def test_new_remind_at_rearms(self):
+        (todo,) = self.todos(1)
+        self.send()
+        todo.refresh_from_db()
+        serializer = TodoSerializer(
+            todo,
+            data={"remind_at": self.now - timedelta(minutes=1)},
+            partial=True,
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertIsNone(Todo.objects.get(pk=todo.pk).reminded_at)
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(self.sent_ids(), [todo.id, todo.id])
+
+    def test_undelivered_reminders_are_retried(self):
+        first, second = self.todos(2)
+        reminders.reminder_due.disconnect(self.receive)
+
+        def deliver_first(sender, reminders, **kwargs):
+            return [first.id]
+
+        reminders.reminder_due.connect(deliver_first)
+        self.addCleanup(reminders.reminder_due.disconnect, deliver_first)
+        with self.assertLogs("todo.reminders", "WARNING"):
+            self.assertEqual(self.send(), 1)
+        second.refresh_from_db()
+        self.assertIsNone(second.reminded_at)
+        # Pending again: the next tick claims it
+        self.assertEqual(list(reminders.pending_reminders()), [second])
+
+    def test_failing_receiver_is_retried(self):
+        self.todos(1)
+
+        def broken(sender, reminders, **kwargs):
+            raise ConnectionError("push service down")
+
+        reminders.reminder_due.disconnect(self.receive)
+        reminders.reminder_due.connect(broken)
+        self.addCleanup(reminders.reminder_due.disconnect, broken)
+        with self.assertLogs("todo.reminders", "WARNING"):
+            self.assertEqual(self.send(), 0)
+        self.assertEqual(reminders.pending_reminders().count(), 1)
+
+    def test_nothing_claimed_without_receivers(self):
+        self.todos(2)
+        reminders.reminder_due.disconnect(self.receive)
+        with self.assertLogs("todo.reminders", "WARNING"):
+            self.assertEqual(self.send(), 0)
+        self.assertEqual(reminders.pending_reminders().count(), 2)
+
+    def test_email_delivery(self):
+        self.user.email = "asha@example.com"
+        self.user.save()
+        nobody = User.objects.create_user("bikash")
+        (todo,) = self.todos(1)
+        Todo.objects.create(
+            user=nobody,
+            title="No address",
+            description="",
+            remind_at=self.now - timedelta(minutes=1),
+        )
+        reminders.reminder_due.connect(delivery.email_reminders)
+        self.addCleanup(reminders.reminder_due.disconnect, delivery.email_reminders)
+
+        self.assertEqual(self.send(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["asha@example.com"])
+        self.assertEqual(mail.outbox[0].subject, f"Reminder: {todo.title}")
+
+    def test_run_reminders_command(self):
+        self.todos(3)
+        out = io.StringIO()
+        call_command("run_reminders", "--once", "--batch-size", "2", stdout=out)
+        self.assertIn("Sent 3 reminders", out.getvalue())
+        self.assertEqual([len(batch) for batch in self.batches], [2, 1])
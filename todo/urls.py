@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import TodoView
+from .views import TodoBulkView, TodoExportView, TodoSyncView, TodoView
 
 urlpatterns = [
     path("todo/", TodoView.as_view(), name="todo_name"),
     path("todo/<int:pk>/", TodoView.as_view(), name="todo_detail"),
+    path("todo/bulk/", TodoBulkView.as_view(), name="todo_bulk"),
+    path("todo/sync/", TodoSyncView.as_view(), name="todo_sync"),
+    path("todo/export/", TodoExportView.as_view(), name="todo_export"),
 ]
@@ -4,25 +4,89 @@ This module uses JWT authentication to ensure only authenticated users can acces
 Each user can only see and modify their own todos (security feature)
 """
 
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.middleware.gzip import re_accepts_gzip
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework import serializers
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import TodoSerializer
+from rest_framework.exceptions import APIException
+from .serializers import TodoSerializer, reset_reminder
 from .models import Todo
+from .renderers import CSVRenderer, NDJSONRenderer
 from rest_framework.views import APIView
 
-# Import JWT authentication instead of Token authentication
-from rest_framework_simplejwt.authentication import JWTAuthentication
+# Import JWT authentication (SimpleJWT with a cached user lookup)
+from account.authentication import CachedJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
+from core.fastpath import compile_serializer
+from core.pagination import KeysetPagination
+from core.streaming import stream_json_list, streaming_response, wants_stream
+
+
+class TodoPagination(KeysetPagination):
+    # Keyset on (created_at, id), newest first
+    page_size = 50
+    max_page_size = 200
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Sync token expired: sync again without since."
+    default_code = "sync_token_expired"
+
+
+class TodoSyncPagination(KeysetPagination):
+    # Keyset on (updated_at, id), oldest change first; ?since= is the token
+    cursor_query_param = "since"
+    page_size = 500
+    max_page_size = 1000
+    # Set by the view: the queryset holds every change up to this time
+    horizon = None
+
+    def decode_cursor(self, request):
+        position = super().decode_cursor(request)
+        # Tombstones this old may be purged (purge_tombstones): the deletes
+        # since the token can no longer all be listed
+        retention = timedelta(days=settings.TODO_TOMBSTONE_RETENTION_DAYS)
+        if position is not None and position[0] < timezone.now() - retention:
+            raise SyncTokenExpired()
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        rows = super().paginate_queryset(queryset, request, view)
+        if not self.has_next and self.horizon is not None:
+            # Caught up: every change up to the horizon has been sent, so
+            # the token moves there and stays younger than the retention
+            # even when nothing changes (the horizon itself is sent again
+            # next time, harmless)
+            self.token = self.encode_cursor([self.horizon, 0])
+        elif rows:
+            # The token points at the last change sent
+            position = [self.get_value(rows[-1], field) for field, _ in self.keys]
+            self.token = self.encode_cursor(position)
+        else:
+            self.token = request.query_params.get(self.cursor_query_param)
+        return rows
 
 
 class TodoView(APIView):
 
     # JWT tokens are more secure and scalable
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     # Require user to be authenticated to access any endpoint
     permission_classes = [IsAuthenticated]
 
+    # List is cursor paginated: pass "next" back as ?cursor= for the next page
+    # (?stream=true streams the whole list instead)
+    pagination_class = TodoPagination
+
     def get(self, request, pk=None):
 
         if pk is not None:
@@ -61,20 +125,44 @@ class TodoView(APIView):
         else:
             # Get all todos for the authenticated user
             # IMPORTANT: Filter by user - users should only see their own todos
-            queryset = Todo.objects.filter(user=request.user).order_by("-created_at")
+            queryset = Todo.objects.filter(user=request.user).order_by(
+                "-created_at", "-id"
+            )
 
-            # Convert multiple Todo instances to JSON format
-            # many=True tells serializer we're serializing a list, not a single object
-            serializer = TodoSerializer(queryset, many=True)
+            # Read-only list: build the JSON straight from .values() rows
+            # (same output as TodoSerializer, without model instances)
+            compiled = compile_serializer(TodoSerializer(many=True))
 
-            return Response(
-                {
-                    "success": True,
-                    "count": len(serializer.data),
-                    "data": serializer.data,
-                },
-                status=status.HTTP_200_OK,
+            # ?stream=true: every todo in one streamed response, memory stays
+            # flat however many there are (count comes after the data)
+            if wants_stream(request):
+                return stream_json_list(
+                    request,
+                    queryset,
+                    compiled,
+                    envelope={"success": True},
+                    count_key="count",
+                )
+
+            # Fetch one page after the cursor (keyset on created_at, id)
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(
+                compiled.values(queryset), request, view=self
             )
+            data = compiled.serialize(page)
+
+            response_data = {"success": True}
+            # Total count on the first page only, counted by the database
+            # from the (user, created_at, id) index; cursor pages skip it
+            if paginator.cursor_query_param not in request.query_params:
+                if paginator.has_next:
+                    response_data["count"] = queryset.count()
+                else:
+                    response_data["count"] = len(data)
+            response_data["next"] = paginator.get_next_link()
+            response_data["data"] = data
+
+            return Response(response_data, status=status.HTTP_200_OK)
 
     def post(self, request):
 
@@ -196,8 +284,8 @@ class TodoView(APIView):
             # This ensures users can only delete their own todos
             todo = Todo.objects.get(pk=pk, user=request.user)
 
-            # Delete the todo from database
-            todo.delete()
+            # Soft delete: the row stays as a tombstone for todo/sync/
+            todo.soft_delete()
 
             return Response(
                 {"success": True, "message": "Todo deleted successfully"},
@@ -222,3 +310,314 @@ class TodoView(APIView):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class TodoBulkView(APIView):
+    """
+    Apply a batch of create/update/delete operations in one request
+
+    POST todo/bulk/
+    {
+        "operations": [
+            {"op": "create", "data": {"title": "...", "description": "..."}},
+            {"op": "update", "id": 5, "data": {"title": "...", "description": "..."}},
+            {"op": "delete", "id": 7}
+        ]
+    }
+
+    Every operation is validated first (TodoSerializer, ownership); if any
+    fails nothing is applied and the errors are returned by index.
+    Otherwise all of them are saved in one transaction with one INSERT
+    and two UPDATEs (deletes are soft, see Todo.soft_delete), and "data"
+    holds one result per operation.
+    """
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    # Upper bound on operations per request
+    max_operations = 100
+
+    # Columns an update operation may change (bulk_update needs them listed)
+    update_fields = [
+        "title",
+        "description",
+        "due_at",
+        "remind_at",
+        "reminded_at",
+        "updated_at",
+    ]
+
+    def post(self, request):
+        operations = None
+        if isinstance(request.data, dict):
+            operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {"success": False, "message": "operations must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(operations) > self.max_operations:
+            return Response(
+                {
+                    "success": False,
+                    "message": f"At most {self.max_operations} operations per request",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            # Lock every todo the batch touches (one query, own todos only)
+            ids = [item.get("id") for item in operations if isinstance(item, dict)]
+            todos = (
+                Todo.objects.select_for_update()
+                .filter(user=request.user, pk__in=[pk for pk in ids if _is_id(pk)])
+                .in_bulk()
+            )
+
+            errors, created, updated, deleted = self.validate(operations, todos)
+            if errors:
+                return Response(
+                    {
+                        "success": False,
+                        "message": "Validation failed",
+                        "errors": errors,
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # update()/bulk_update() skip auto_now: set updated_at here
+            now = timezone.now()
+            if deleted:
+                Todo.objects.filter(user=request.user, pk__in=deleted).update(
+                    deleted_at=now, updated_at=now
+                )
+            if updated:
+                for todo in updated:
+                    todo.updated_at = now
+                Todo.objects.bulk_update(updated, self.update_fields)
+            if created:
+                Todo.objects.bulk_create(created)
+
+        results = []
+        created, updated = iter(created), iter(updated)
+        for item in operations:
+            op = item["op"]
+            if op == "delete":
+                results.append({"op": op, "id": item["id"]})
+            else:
+                todo = next(created) if op == "create" else next(updated)
+                results.append({"op": op, "data": TodoSerializer(todo).data})
+
+        return Response(
+            {"success": True, "count": len(results), "data": results},
+            status=status.HTTP_200_OK,
+        )
+
+    def validate(self, operations, todos):
+        """
+        Validate every operation against the locked todos
+        Returns (errors, new todos, changed todos, ids to delete)
+        """
+        errors = []
+        created, updated, deleted = [], [], []
+        seen = set()
+
+        for index, item in enumerate(operations):
+            op = item.get("op") if isinstance(item, dict) else None
+            if op not in ("create", "update", "delete"):
+                errors.append(
+                    {
+                        "index": index,
+                        "errors": {"op": ["Must be create, update or delete"]},
+                    }
+                )
+                continue
+
+            if op in ("update", "delete"):
+                pk = item.get("id")
+                if not _is_id(pk) or pk not in todos:
+                    errors.append(
+                        {
+                            "index": index,
+                            "errors": {
+                                "id": [
+                                    "Todo not found or you don't have permission to change it"
+                                ]
+                            },
+                        }
+                    )
+                    continue
+                # A todo can appear only once per batch
+                if pk in seen:
+                    errors.append(
+                        {"index": index, "errors": {"id": ["Duplicate todo in batch"]}}
+                    )
+                    continue
+                seen.add(pk)
+
+                if op == "delete":
+                    deleted.append(pk)
+                    continue
+
+            serializer = TodoSerializer(
+                todos[pk] if op == "update" else None, data=item.get("data")
+            )
+            if not serializer.is_valid():
+                errors.append({"index": index, "errors": serializer.errors})
+            elif op == "create":
+                created.append(
+                    Todo(user=self.request.user, **serializer.validated_data)
+                )
+            else:
+                todo = todos[pk]
+                reset_reminder(todo, serializer.validated_data)
+                for field, value in serializer.validated_data.items():
+                    setattr(todo, field, value)
+                updated.append(todo)
+
+        return errors, created, updated, deleted
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class TodoSyncView(APIView):
+    """
+    Delta sync: what changed since the client's last sync
+
+    GET todo/sync/              every live todo (first sync)
+    GET todo/sync/?since=<token>  todos created/changed since the token,
+                                  and the ids of todos deleted since
+
+    {"success": true, "data": [...], "deleted": [3, 9],
+     "token": "...", "has_more": false}
+
+    Store "token" and send it as ?since= next time. While has_more is true
+    call again right away with the new token.
+
+    A token older than TODO_TOMBSTONE_RETENTION_DAYS gets 410 Gone: the
+    tombstones it would need may have been purged, so the client drops
+    its copy and syncs again without since.
+
+    Changes younger than TODO_SYNC_SETTLE_SECONDS are left for the next
+    sync: updated_at is set when a todo is saved, not when its transaction
+    commits, so a change committing later than that after its save can
+    land behind a token already handed out and be missed until the todo
+    changes again. Keep it above the longest transaction writing todos.
+    """
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = TodoSyncPagination
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        # Changes younger than this are left for the next sync, so a save
+        # still committing with an older updated_at isn't skipped by the token
+        settle_time = timedelta(seconds=settings.TODO_SYNC_SETTLE_SECONDS)
+
+        paginator.horizon = timezone.now() - settle_time
+
+        # all_objects: deleted todos (tombstones) are part of the changes
+        queryset = Todo.all_objects.filter(
+            user=request.user, updated_at__lte=paginator.horizon
+        ).order_by("updated_at", "id")
+        if paginator.cursor_query_param not in request.query_params:
+            # First sync: the client has nothing to delete yet
+            queryset = queryset.filter(deleted_at__isnull=True)
+
+        compiled = compile_serializer(TodoSerializer(many=True))
+        rows = paginator.paginate_queryset(
+            compiled.values(queryset, "deleted_at"), request, view=self
+        )
+        # dicts, or instances when compiling is switched off
+        get = paginator.get_value
+
+        return Response(
+            {
+                "success": True,
+                "data": compiled.serialize(
+                    [row for row in rows if get(row, "deleted_at") is None]
+                ),
+                "deleted": [
+                    get(row, "id") for row in rows if get(row, "deleted_at") is not None
+                ],
+                "token": paginator.token,
+                "has_more": paginator.has_next,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class TodoExportView(APIView):
+    """
+    Export all of the user's todos, streamed
+
+    GET todo/export/?format=csv      (default)
+    GET todo/export/?format=ndjson   (one JSON object per line)
+
+    Rows are read from a server-side cursor (.iterator()) and written in
+    chunks, so memory stays flat however many todos there are. The body
+    is gzipped on the fly when the client sends Accept-Encoding: gzip.
+    Under ASGI the chunks are sent as they are ready too (see
+    core.streaming).
+    """
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    columns = [
+        "id",
+        "title",
+        "description",
+        "created_at",
+        "updated_at",
+        "due_at",
+        "remind_at",
+        "reminded_at",
+    ]
+    chunk_size = 2000
+
+    def get(self, request):
+        renderer = request.accepted_renderer
+        rows = (
+            Todo.objects.filter(user=request.user)
+            .order_by("created_at", "id")
+            .values_list(*self.columns)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        content = renderer.stream(self.columns, self.format_rows(rows))
+
+        gzipped = re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if gzipped:
+            content = compress_sequence(content)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = streaming_response(request, content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="todos.{renderer.format}"'
+        )
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+    def format_rows(self, rows):
+        # Dates are written the way the API returns them
+        to_text = serializers.DateTimeField().to_representation
+        dates = [
+            index
+            for index, name in enumerate(self.columns)
+            if isinstance(Todo._meta.get_field(name), models.DateTimeField)
+        ]
+        for row in rows:
+            row = list(row)
+            for index in dates:
+                if row[index] is not None:
+                    row[index] = to_text(row[index])
+            yield row